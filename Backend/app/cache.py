@@ -0,0 +1,248 @@
+"""Two-tier cache for upstream JSON responses.
+
+Lookups hit a bounded in-memory LRU first and fall back to the
+``response_cache`` SQLite table, which survives restarts. Entries honour the
+upstream Cache-Control and ETag headers: stale entries are served immediately
+while a background request revalidates them with If-None-Match.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import Request
+from sqlalchemy import delete
+
+from . import config, models
+from .database import AsyncReadSessionLocal, AsyncSessionLocal
+from .jikan import BACKGROUND, INTERACTIVE
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is not None and (item[1] is None or item[1] > time.monotonic()):
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+        if item is not None:
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (value, time.monotonic() + ttl if ttl is not None else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: int
+    stale_ttl: int
+
+SEARCH = CachePolicy(config.CACHE_SEARCH_TTL, config.CACHE_SEARCH_STALE)
+DETAILS = CachePolicy(config.CACHE_DETAILS_TTL, config.CACHE_DETAILS_STALE)
+TRENDING = CachePolicy(config.CACHE_TRENDING_TTL, config.CACHE_TRENDING_STALE)
+
+@dataclass
+class CacheEntry:
+    data: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fresh_until: float
+    stale_until: float
+
+@dataclass
+class CachedResponse:
+    """Just enough of httpx.Response for the routers: a status and a JSON body"""
+    status_code: int
+    data: Any = None
+    cache_status: str = "miss"
+
+    def json(self):
+        return self.data
+
+def cache_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    if not params:
+        return path
+    query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{path}?{query}"
+
+def _parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+def _lifetimes(response: httpx.Response, policy: CachePolicy):
+    """(fresh_seconds, stale_seconds) for a response, or None if uncacheable"""
+    directives = _parse_cache_control(response.headers.get("cache-control", ""))
+    if "no-store" in directives:
+        return None
+    max_age = directives.get("max-age") or ""
+    swr = directives.get("stale-while-revalidate") or ""
+
+    ttl = min(policy.ttl, int(max_age)) if max_age.isdigit() else policy.ttl
+    if "no-cache" in directives:
+        ttl = 0
+    stale = int(swr) if swr.isdigit() else policy.stale_ttl
+    return ttl, stale
+
+class ResponseCache:
+    def __init__(
+        self,
+        maxsize: int = config.RESPONSE_CACHE_MAX_ENTRIES,
+        session_factory=AsyncSessionLocal,
+        read_session_factory=AsyncReadSessionLocal,
+    ):
+        self.memory = TTLCache(maxsize)
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        self._revalidating: Dict[str, asyncio.Task] = {}
+
+    async def get(
+        self,
+        upstream,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        policy: CachePolicy = SEARCH,
+        priority: int = INTERACTIVE,
+    ) -> CachedResponse:
+        """GET ``path`` through the cache, fetching from ``upstream`` only when needed
+
+        ``upstream`` is a jikan.JikanScheduler (anything with a matching ``get``).
+        """
+        key = cache_key(path, params)
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is None:
+            # Expired rows still come back so their ETag can revalidate them
+            entry = await self._load(key)
+            if entry is not None and entry.stale_until > now:
+                self.memory.set(key, entry, entry.stale_until - now)
+
+        if entry is not None and entry.fresh_until > now:
+            return CachedResponse(200, entry.data, "fresh")
+        if entry is not None and entry.stale_until > now:
+            self._revalidate_in_background(upstream, key, path, params, policy, entry)
+            return CachedResponse(200, entry.data, "stale")
+
+        try:
+            return await self._fetch(upstream, key, path, params, policy, entry, priority)
+        except httpx.HTTPError:
+            if entry is not None:
+                return CachedResponse(200, entry.data, "stale")
+            raise
+
+    async def _fetch(self, upstream, key, path, params, policy, entry: Optional[CacheEntry], priority) -> CachedResponse:
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = await upstream.get(path, params=params, headers=headers, priority=priority)
+        if response.status_code == 304 and entry is not None:
+            data, cache_status = entry.data, "revalidated"
+        elif response.status_code == 200:
+            data, cache_status = response.json(), "miss"
+        else:
+            # Errors are passed through uncached
+            return CachedResponse(response.status_code)
+
+        lifetimes = _lifetimes(response, policy)
+        if lifetimes is None:
+            return CachedResponse(200, data, cache_status)
+        now = time.time()
+        fresh = CacheEntry(
+            data=data,
+            etag=response.headers.get("etag") or (entry.etag if entry else None),
+            last_modified=response.headers.get("last-modified") or (entry.last_modified if entry else None),
+            fresh_until=now + lifetimes[0],
+            stale_until=now + lifetimes[0] + lifetimes[1],
+        )
+        self.memory.set(key, fresh, fresh.stale_until - now)
+        await self._save(key, fresh)
+        return CachedResponse(200, data, cache_status)
+
+    def _revalidate_in_background(self, upstream, key, path, params, policy, entry):
+        if key in self._revalidating:
+            return
+
+        async def revalidate():
+            try:
+                await self._fetch(upstream, key, path, params, policy, entry, BACKGROUND)
+            except Exception as e:
+                print(f"[CACHE] Revalidation failed for {key}: {e}")
+            finally:
+                self._revalidating.pop(key, None)
+
+        self._revalidating[key] = asyncio.create_task(revalidate())
+
+    async def _load(self, key: str) -> Optional[CacheEntry]:
+        async with self._read_session_factory() as db:
+            row = await db.get(models.ResponseCacheEntry, key)
+            if row is None:
+                return None
+            return CacheEntry(
+                data=json.loads(row.data),
+                etag=row.etag,
+                last_modified=row.last_modified,
+                fresh_until=row.fresh_until,
+                stale_until=row.stale_until,
+            )
+
+    async def _save(self, key: str, entry: CacheEntry):
+        async with self._session_factory() as db:
+            await db.merge(models.ResponseCacheEntry(
+                key=key,
+                data=json.dumps(entry.data),
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+                fresh_until=entry.fresh_until,
+                stale_until=entry.stale_until,
+                stored_at=time.time(),
+            ))
+            await db.commit()
+
+    async def purge(self, retention: int = config.RESPONSE_CACHE_RETENTION) -> int:
+        """Drop persisted entries that went stale more than ``retention`` seconds ago"""
+        async with self._session_factory() as db:
+            result = await db.execute(delete(models.ResponseCacheEntry).where(
+                models.ResponseCacheEntry.stale_until < time.time() - retention
+            ))
+            await db.commit()
+            return result.rowcount
+
+    async def aclose(self):
+        for task in list(self._revalidating.values()):
+            task.cancel()
+
+def get_response_cache(request: Request) -> ResponseCache:
+    """Dependency returning the cache created in the app lifespan"""
+    return request.app.state.response_cache
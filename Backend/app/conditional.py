@@ -0,0 +1,79 @@
+"""Conditional GET for the library list and /stats endpoints.
+
+Every write to a media table bumps its row in ``table_versions`` (see
+counters.py), so a weak ETag is one primary-key lookup no matter how large the
+library is. ``library_validators`` checks If-None-Match / If-Modified-Since
+before the handler runs and answers 304 without running the list query or
+serializing anything, so an idle library costs a polling client almost nothing.
+"""
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models
+from .database import get_read_db
+
+class Validators:
+    """ETag and Last-Modified of one representation"""
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[float]):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self.etag is None:
+            return {}
+        return {
+            "ETag": self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            # Clients may keep the body but must revalidate before reusing it
+            "Cache-Control": "no-cache",
+        }
+
+    def matches(self, request: Request) -> bool:
+        if self.etag is None:
+            return False
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison, as If-None-Match requires
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag.removeprefix("W/") in tags
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.last_modified) <= since
+        return False
+
+def library_validators(*tables: str):
+    """Dependency computing the validators of a response built from ``tables``
+
+    Raises a 304 carrying the validators when the client's copy is current.
+    """
+    name = tables[0] if len(tables) == 1 else "stats"
+
+    async def dependency(request: Request, db: AsyncSession = Depends(get_read_db)) -> Validators:
+        # Read before the handler's query: a write landing in between makes
+        # the ETag older than the body, which only costs one extra download
+        table = models.TableVersion
+        rows = {
+            row.media: row
+            for row in await db.execute(
+                select(table.media, table.version, table.changed_at).where(table.media.in_(tables))
+            )
+        }
+        if len(rows) < len(tables):
+            return Validators(None, None)
+        versions = "-".join(str(rows[t].version) for t in tables)
+        validators = Validators(f'W/"{name}-{versions}"', max(row.changed_at for row in rows.values()))
+        if validators.matches(request):
+            raise HTTPException(status_code=304, headers=validators.headers)
+        return validators
+
+    return dependency
@@ -0,0 +1,120 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+# Jikan (unofficial MyAnimeList API) upstream client
+JIKAN_API_BASE = os.getenv("JIKAN_API_BASE", "https://api.jikan.moe/v4")
+JIKAN_HTTP2 = env_bool("JIKAN_HTTP2", False)
+JIKAN_CONNECT_TIMEOUT = env_float("JIKAN_CONNECT_TIMEOUT", 5.0)
+JIKAN_READ_TIMEOUT = env_float("JIKAN_READ_TIMEOUT", 10.0)
+JIKAN_MAX_CONNECTIONS = env_int("JIKAN_MAX_CONNECTIONS", 20)
+JIKAN_MAX_KEEPALIVE = env_int("JIKAN_MAX_KEEPALIVE", 10)
+JIKAN_KEEPALIVE_EXPIRY = env_float("JIKAN_KEEPALIVE_EXPIRY", 30.0)
+
+# Jikan response cache: fresh TTL / stale-while-revalidate window, in seconds
+RESPONSE_CACHE_MAX_ENTRIES = env_int("RESPONSE_CACHE_MAX_ENTRIES", 1024)
+RESPONSE_CACHE_RETENTION = env_int("RESPONSE_CACHE_RETENTION", 30 * 86400)
+CACHE_SEARCH_TTL = env_int("CACHE_SEARCH_TTL", 3600)
+CACHE_SEARCH_STALE = env_int("CACHE_SEARCH_STALE", 86400)
+CACHE_DETAILS_TTL = env_int("CACHE_DETAILS_TTL", 86400)
+CACHE_DETAILS_STALE = env_int("CACHE_DETAILS_STALE", 7 * 86400)
+CACHE_TRENDING_TTL = env_int("CACHE_TRENDING_TTL", 3 * 3600)
+CACHE_TRENDING_STALE = env_int("CACHE_TRENDING_STALE", 86400)
+
+# Jikan rate limits (documented as 3 req/s and 60 req/min) and retry policy
+JIKAN_RATE_PER_SECOND = env_float("JIKAN_RATE_PER_SECOND", 3.0)
+JIKAN_RATE_PER_MINUTE = env_float("JIKAN_RATE_PER_MINUTE", 60.0)
+JIKAN_WORKERS = env_int("JIKAN_WORKERS", 3)
+JIKAN_MAX_RETRIES = env_int("JIKAN_MAX_RETRIES", 3)
+JIKAN_BACKOFF_BASE = env_float("JIKAN_BACKOFF_BASE", 1.0)
+
+# SQLite database file, relative to the working directory
+DATABASE_PATH = os.getenv("DATABASE_PATH", "./app.db")
+
+# SQLite performance profile, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+SQLITE_CACHE_SIZE = env_int("SQLITE_CACHE_SIZE", -64000)  # negative means KiB
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_READER_POOL_SIZE = env_int("SQLITE_READER_POOL_SIZE", 8)
+
+# Bulk import endpoints
+BULK_MAX_ITEMS = env_int("BULK_MAX_ITEMS", 10000)
+
+# Official MyAnimeList API, used for importing user lists (Jikan no longer serves them)
+MAL_API_BASE = os.getenv("MAL_API_BASE", "https://api.myanimelist.net/v2")
+MAL_CLIENT_ID = os.getenv("MAL_CLIENT_ID", "")
+MAL_RATE_PER_SECOND = env_float("MAL_RATE_PER_SECOND", 2.0)
+MAL_IMPORT_PAGE_SIZE = env_int("MAL_IMPORT_PAGE_SIZE", 100)
+MAL_IMPORT_CONCURRENCY = env_int("MAL_IMPORT_CONCURRENCY", 3)
+
+# Spotify Web API client, shared by every user token
+SPOTIFY_API_BASE = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+SPOTIFY_CONNECT_TIMEOUT = env_float("SPOTIFY_CONNECT_TIMEOUT", 5.0)
+SPOTIFY_READ_TIMEOUT = env_float("SPOTIFY_READ_TIMEOUT", 10.0)
+SPOTIFY_MAX_CONNECTIONS = env_int("SPOTIFY_MAX_CONNECTIONS", 50)
+SPOTIFY_MAX_KEEPALIVE = env_int("SPOTIFY_MAX_KEEPALIVE", 20)
+SPOTIFY_MAX_RETRIES = env_int("SPOTIFY_MAX_RETRIES", 3)
+SPOTIFY_MAX_RETRY_WAIT = env_float("SPOTIFY_MAX_RETRY_WAIT", 30.0)
+SPOTIFY_CLIENT_CACHE_SIZE = env_int("SPOTIFY_CLIENT_CACHE_SIZE", 256)
+SPOTIFY_FANOUT_CONCURRENCY = env_int("SPOTIFY_FANOUT_CONCURRENCY", 8)
+SPOTIFY_ARTIST_ALBUMS_TTL = env_int("SPOTIFY_ARTIST_ALBUMS_TTL", 6 * 3600)
+SPOTIFY_ARTIST_ALBUMS_CACHE_SIZE = env_int("SPOTIFY_ARTIST_ALBUMS_CACHE_SIZE", 4096)
+SPOTIFY_USER_STATS_TTL = env_int("SPOTIFY_USER_STATS_TTL", 30 * 60)
+SPOTIFY_BATCH_MAX_IDS = env_int("SPOTIFY_BATCH_MAX_IDS", 1000)
+SPOTIFY_MIRROR_MAX_AGE = env_int("SPOTIFY_MIRROR_MAX_AGE", 15 * 60)
+SPOTIFY_ENTITY_CACHE_SIZE = env_int("SPOTIFY_ENTITY_CACHE_SIZE", 10000)
+SPOTIFY_ALBUM_TTL = env_int("SPOTIFY_ALBUM_TTL", 7 * 86400)
+SPOTIFY_TRACK_TTL = env_int("SPOTIFY_TRACK_TTL", 7 * 86400)
+SPOTIFY_ARTIST_TTL = env_int("SPOTIFY_ARTIST_TTL", 86400)
+
+# /images proxy: content-addressed disk cache of cover art and its thumbnails
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./image_cache")
+IMAGE_CACHE_MAX_BYTES = env_int("IMAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+IMAGE_MAX_SOURCE_BYTES = env_int("IMAGE_MAX_SOURCE_BYTES", 20 * 1024 * 1024)
+# Hosts (and their subdomains) the proxy may fetch from
+IMAGE_ALLOWED_HOSTS = [
+    host.strip().lower()
+    for host in os.getenv(
+        "IMAGE_ALLOWED_HOSTS",
+        "myanimelist.net,scdn.co,spotifycdn.com,rawg.io,mzstatic.com",
+    ).split(",")
+    if host.strip()
+]
+# Thumbnail widths; a requested width is rounded up to the next one
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "96,160,240,320,480,640").split(","))
+IMAGE_QUALITY = env_int("IMAGE_QUALITY", 80)
+IMAGE_WORKERS = env_int("IMAGE_WORKERS", 2)
+IMAGE_CONNECT_TIMEOUT = env_float("IMAGE_CONNECT_TIMEOUT", 5.0)
+IMAGE_READ_TIMEOUT = env_float("IMAGE_READ_TIMEOUT", 15.0)
+
+# Background enrichment of new anime/manga with a mal_id from Jikan details
+ENRICH_WORKERS = env_int("ENRICH_WORKERS", 2)
+ENRICH_BATCH_SIZE = env_int("ENRICH_BATCH_SIZE", 50)
+ENRICH_FLUSH_INTERVAL = env_float("ENRICH_FLUSH_INTERVAL", 2.0)
+ENRICH_MAX_ATTEMPTS = env_int("ENRICH_MAX_ATTEMPTS", 5)
+ENRICH_BACKOFF_BASE = env_float("ENRICH_BACKOFF_BASE", 30.0)
+
+# Periodic refresh of episode/chapter totals for titles being watched or read
+REFRESH_ENABLED = env_bool("REFRESH_ENABLED", True)
+REFRESH_INTERVAL = env_float("REFRESH_INTERVAL", 6 * 3600)
+REFRESH_JITTER = env_float("REFRESH_JITTER", 0.1)  # fraction of the interval
+REFRESH_INITIAL_DELAY = env_float("REFRESH_INITIAL_DELAY", 300)
+REFRESH_BATCH_SIZE = env_int("REFRESH_BATCH_SIZE", 25)
@@ -0,0 +1,168 @@
+"""Library counters backing /stats.
+
+Every media table has SQLite triggers that fold inserts, updates and deletes
+into ``media_counters`` inside the writer's own transaction, so /stats reads a
+handful of rows no matter how large the library is.
+
+The same tables also bump their row in ``table_versions`` on any write, which
+gives the list and /stats endpoints a cheap ETag (see conditional.py).
+
+Rebuild the counters from scratch with:
+
+    python -m app.counters
+"""
+from sqlalchemy import text
+from .database import engine
+
+# Which columns feed each counter, per media table
+COUNTED_TABLES = {
+    "anime": {"progress": "current_episode", "volumes": None, "favorite": None},
+    "manga": {"progress": "current_chapter", "volumes": "current_volume", "favorite": None},
+    "games": {"progress": "playtime_hours", "volumes": None, "favorite": None},
+    "music": {"progress": "play_count", "volumes": None, "favorite": "favorite"},
+}
+
+def _contribution(table: str, row: str, sign: str) -> str:
+    """VALUES tuple for one row's contribution to its (media, status) counter"""
+    spec = COUNTED_TABLES[table]
+    favorite = f"CASE WHEN {row}.{spec['favorite']} THEN 1 ELSE 0 END" if spec["favorite"] else "0"
+    volumes = f"COALESCE({row}.{spec['volumes']}, 0)" if spec["volumes"] else "0"
+    return (
+        f"('{table}', COALESCE({row}.status, ''), {sign}1, {sign}{favorite}, "
+        f"{sign}COALESCE({row}.{spec['progress']}, 0), {sign}{volumes})"
+    )
+
+def _upsert(values: str) -> str:
+    return f"""
+        INSERT INTO media_counters
+            (media, status, item_count, favorite_count, progress_total, volume_total)
+        VALUES {values}
+        ON CONFLICT (media, status) DO UPDATE SET
+            item_count = item_count + excluded.item_count,
+            favorite_count = favorite_count + excluded.favorite_count,
+            progress_total = progress_total + excluded.progress_total,
+            volume_total = volume_total + excluded.volume_total;
+    """
+
+def _trigger_ddl(table: str):
+    spec = COUNTED_TABLES[table]
+    watched = ["status"] + [c for c in (spec["progress"], spec["volumes"], spec["favorite"]) if c]
+    yield f"trg_{table}_counters_insert", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_counters_insert AFTER INSERT ON {table}
+        BEGIN {_upsert(_contribution(table, "NEW", ""))} END
+    """
+    yield f"trg_{table}_counters_delete", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_counters_delete AFTER DELETE ON {table}
+        BEGIN {_upsert(_contribution(table, "OLD", "-"))} END
+    """
+    yield f"trg_{table}_counters_update", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_counters_update
+        AFTER UPDATE OF {", ".join(watched)} ON {table}
+        BEGIN
+            {_upsert(_contribution(table, "OLD", "-"))}
+            {_upsert(_contribution(table, "NEW", ""))}
+        END
+    """
+
+# Epoch seconds, with sub-second precision, inside SQL
+NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+
+def _version_trigger_ddl(table: str):
+    bump = f"UPDATE table_versions SET version = version + 1, changed_at = {NOW} WHERE media = '{table}';"
+    for event in ("insert", "update", "delete"):
+        yield f"trg_{table}_version_{event}", f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event} AFTER {event.upper()} ON {table}
+            BEGIN {bump} END
+        """
+
+def _seed_versions(conn):
+    # Start from the current time in ms so a recreated database never
+    # hands out an ETag a client saw before
+    for table in COUNTED_TABLES:
+        conn.execute(text(f"""
+            INSERT OR IGNORE INTO table_versions (media, version, changed_at)
+            VALUES ('{table}', CAST({NOW} * 1000 AS INTEGER), {NOW})
+        """))
+
+def _rebuild(conn):
+    conn.execute(text("DELETE FROM media_counters"))
+    for table, spec in COUNTED_TABLES.items():
+        favorite = f"SUM(CASE WHEN {spec['favorite']} THEN 1 ELSE 0 END)" if spec["favorite"] else "0"
+        volumes = f"COALESCE(SUM({spec['volumes']}), 0)" if spec["volumes"] else "0"
+        conn.execute(text(f"""
+            INSERT INTO media_counters
+                (media, status, item_count, favorite_count, progress_total, volume_total)
+            SELECT '{table}', COALESCE(status, ''), COUNT(*), {favorite},
+                   COALESCE(SUM({spec['progress']}), 0), {volumes}
+            FROM {table}
+            GROUP BY COALESCE(status, '')
+        """))
+
+def rebuild_counters(bind=engine):
+    """Recompute every counter with one GROUP BY per media table"""
+    with bind.begin() as conn:
+        _rebuild(conn)
+
+def install_counters(bind=engine):
+    """Create the counter and version triggers, seeding the counters if any were missing"""
+    with bind.begin() as conn:
+        existing = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        )).scalars())
+        missing = False
+        for table in COUNTED_TABLES:
+            for name, ddl in _trigger_ddl(table):
+                if name not in existing:
+                    missing = True
+                    conn.execute(text(ddl))
+            for name, ddl in _version_trigger_ddl(table):
+                if name not in existing:
+                    conn.execute(text(ddl))
+        _seed_versions(conn)
+        if missing:
+            _rebuild(conn)
+
+def summarize(counters) -> dict:
+    """Shape MediaCounter rows into the /stats payload"""
+    by_status = {}
+    totals = {media: {"items": 0, "favorites": 0, "progress": 0, "volumes": 0} for media in COUNTED_TABLES}
+    for row in counters:
+        by_status[(row.media, row.status)] = row.item_count
+        total = totals.setdefault(row.media, {"items": 0, "favorites": 0, "progress": 0, "volumes": 0})
+        total["items"] += row.item_count
+        total["favorites"] += row.favorite_count
+        total["progress"] += row.progress_total
+        total["volumes"] += row.volume_total
+
+    def count(media, status):
+        return by_status.get((media, status), 0)
+
+    return {
+        "total_anime": totals["anime"]["items"],
+        "total_manga": totals["manga"]["items"],
+        "total_games": totals["games"]["items"],
+        "total_music": totals["music"]["items"],
+        "anime_watching": count("anime", "watching"),
+        "anime_completed": count("anime", "completed"),
+        "anime_plan_to_watch": count("anime", "plan_to_watch"),
+        "anime_dropped": count("anime", "dropped"),
+        "manga_reading": count("manga", "reading"),
+        "manga_completed": count("manga", "completed"),
+        "manga_plan_to_read": count("manga", "plan_to_read"),
+        "manga_dropped": count("manga", "dropped"),
+        "games_playing": count("games", "playing"),
+        "games_completed": count("games", "completed"),
+        "music_listening": count("music", "listening"),
+        "music_completed": count("music", "completed"),
+        "music_favorites": totals["music"]["favorites"],
+        "total_episodes_watched": int(totals["anime"]["progress"]),
+        "total_chapters_read": int(totals["manga"]["progress"]),
+        "total_volumes_read": int(totals["manga"]["volumes"]),
+        "total_playtime_hours": int(totals["games"]["progress"]),
+        "total_plays": int(totals["music"]["progress"]),
+    }
+
+# Run this to recompute the counters from the media tables
+if __name__ == "__main__":
+    rebuild_counters()
+    print("Counters rebuilt successfully!")
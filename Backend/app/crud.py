@@ -1,27 +1,204 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
-from . import models, schemas
-from typing import List, Optional
+from sqlalchemy import bindparam, select, func, or_, tuple_, inspect, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.sqlite import insert
+from fastapi import HTTPException
+from . import fts, models, schemas
+from .counters import summarize
+import heapq
+from functools import lru_cache
+from pydantic import TypeAdapter, ValidationError
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# The get_* and get_all_* readers return ORM objects, or plain rows when given ``columns``
+# (see fields.FieldSet), which the list and detail endpoints serialize directly.
+def _page(query, model, skip: int, limit: int, after: Optional[Tuple[datetime, int]]):
+    """Order a list query newest first; keyset from ``after`` when given, else offset"""
+    query = query.order_by(model.updated_at.desc(), model.id.desc())
+    if after is not None:
+        query = query.filter(tuple_(model.updated_at, model.id) < tuple_(*after))
+    else:
+        query = query.offset(skip)
+    return query.limit(limit)
+
+# SQLite allows at most 32766 bound parameters per statement
+IN_CHUNK = 900
+
+async def _bulk_upsert(db: AsyncSession, model, rows: List[Dict[str, Any]], key: Optional[str], commit: bool = True):
+    """Write ``rows`` in one transaction, updating existing rows that share ``key``
+
+    Rows are grouped by the fields they set, so an upsert only overwrites what the
+    caller sent, and each group goes out as a batched multi-row INSERT ... ON CONFLICT.
+    With ``commit=False`` the caller owns the transaction.
+    """
+    synonyms = {name: prop.name for name, prop in inspect(model).synonyms.items()}
+    rows = [{synonyms.get(k, k): v for k, v in row.items()} for row in rows]
+    results: List[Optional[dict]] = [None] * len(rows)
+
+    # The last item with a given key wins; earlier duplicates are skipped
+    last_seen = {row[key]: i for i, row in enumerate(rows) if key and row.get(key) is not None}
+    groups: Dict[frozenset, List[int]] = {}
+    for i, row in enumerate(rows):
+        if key and row.get(key) is not None and last_seen[row[key]] != i:
+            results[i] = {"index": i, "id": None, "action": "skipped", "detail": f"duplicate {key}, a later item wins"}
+        else:
+            groups.setdefault(frozenset(row), []).append(i)
+
+    existing = set()
+    keys = list(last_seen)
+    for start in range(0, len(keys), IN_CHUNK):
+        chunk = keys[start:start + IN_CHUNK]
+        existing.update((await db.execute(select(getattr(model, key)).where(getattr(model, key).in_(chunk)))).scalars())
+
+    now = datetime.utcnow()
+    for fields, indexes in groups.items():
+        stmt = insert(model)
+        if key:
+            updates = {f: stmt.excluded[f] for f in fields if f != key}
+            updates["updated_at"] = stmt.excluded.updated_at
+            stmt = stmt.on_conflict_do_update(index_elements=[key], set_=updates)
+        key_column = getattr(model, key) if key else model.id
+        returned = (await db.execute(
+            stmt.returning(model.id, key_column),
+            [{**rows[i], "created_at": now, "updated_at": now} for i in indexes],
+        )).all()
+
+        ids_by_key = {k: row_id for row_id, k in returned if key}
+        # Fresh rowids are handed out in VALUES order, so sorted ids line up with unkeyed rows
+        unkeyed_ids = iter(sorted(row_id for row_id, k in returned if not key or k is None))
+        for i in indexes:
+            value = rows[i].get(key) if key else None
+            if value is None:
+                results[i] = {"index": i, "id": next(unkeyed_ids), "action": "created"}
+            else:
+                action = "updated" if value in existing else "created"
+                results[i] = {"index": i, "id": ids_by_key[value], "action": action}
+
+    if commit:
+        await db.commit()
+    counts = {"created": 0, "updated": 0, "skipped": 0}
+    for result in results:
+        counts[result["action"]] += 1
+    return {**counts, "results": results}
+
+@lru_cache(maxsize=None)
+def _change_adapters(update_schema) -> Dict[str, TypeAdapter]:
+    return {name: TypeAdapter(field.annotation) for name, field in update_schema.model_fields.items()}
+
+def _outcome(results, indexes, status: str, detail: Optional[str] = None):
+    for i in indexes:
+        results[i] = {**results[i], "status": status, "detail": detail}
+
+async def batch_update(db: AsyncSession, model, update_schema, items: List[schemas.BatchPatchItem], atomic: bool = True):
+    """Apply many partial updates in one transaction, one executemany UPDATE per set of changed fields
+
+    Changes are validated field by field against ``update_schema``. Several items
+    for the same id are merged in order. With ``atomic`` any invalid, missing or
+    failing item rolls the whole batch back; otherwise the rest still commits.
+    """
+    synonyms = {name: prop.name for name, prop in inspect(model).synonyms.items()}
+    adapters = _change_adapters(update_schema)
+    results: List[dict] = [{"index": i, "id": item.id, "status": "updated"} for i, item in enumerate(items)]
+    valid: Dict[int, List[int]] = {}
+    changes: Dict[int, Dict[str, Any]] = {}
+    for i, item in enumerate(items):
+        unknown = sorted(set(item.changes) - set(adapters))
+        if unknown or not item.changes:
+            detail = f"unknown fields: {', '.join(unknown)}" if unknown else "no changes"
+            _outcome(results, [i], "invalid", detail)
+            continue
+        try:
+            values = {synonyms.get(k, k): adapters[k].validate_python(v) for k, v in item.changes.items()}
+        except ValidationError as e:
+            _outcome(results, [i], "invalid", str(e.errors(include_url=False)[0]["msg"]))
+            continue
+        valid.setdefault(item.id, []).append(i)
+        changes.setdefault(item.id, {}).update(values)
+
+    ids = list(valid)
+    existing = set()
+    for start in range(0, len(ids), IN_CHUNK):
+        chunk = ids[start:start + IN_CHUNK]
+        existing.update((await db.execute(select(model.id).where(model.id.in_(chunk)))).scalars())
+    for row_id in set(ids) - existing:
+        _outcome(results, valid.pop(row_id), "not_found")
+
+    def finish(committed: bool):
+        updated = sum(r["status"] == "updated" for r in results)
+        return {"committed": committed, "updated": updated, "failed": len(results) - updated, "results": results}
+
+    if atomic and any(r["status"] != "updated" for r in results):
+        _outcome(results, [i for indexes in valid.values() for i in indexes], "rolled_back")
+        return finish(False)
+
+    groups: Dict[frozenset, List[int]] = {}
+    for row_id in valid:
+        groups.setdefault(frozenset(changes[row_id]), []).append(row_id)
+    table = model.__table__
+    now = datetime.utcnow()
+    for fields, row_ids in groups.items():
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("match_id"))
+            .values({**{f: bindparam(f"new_{f}") for f in fields}, "updated_at": now})
+        )
+        params = [{"match_id": row_id, **{f"new_{f}": v for f, v in changes[row_id].items()}} for row_id in row_ids]
+        try:
+            await db.execute(stmt, params)
+        except IntegrityError as e:
+            if atomic:
+                await db.rollback()
+                _outcome(results, [i for row_id in row_ids for i in valid[row_id]], "failed", str(e.orig))
+                _outcome(results, [i for indexes in valid.values() for i in indexes if results[i]["status"] == "updated"], "rolled_back")
+                return finish(False)
+            # Updates are idempotent, so redo this group row by row to find the offenders;
+            # SQLite undoes just the failing statement
+            for row_id, row_params in zip(row_ids, params):
+                try:
+                    await db.execute(stmt, [row_params])
+                except IntegrityError as row_error:
+                    _outcome(results, valid[row_id], "failed", str(row_error.orig))
+    await db.commit()
+    return finish(True)
+
+async def _commit_unique(db: AsyncSession, obj, key: str):
+    """Commit and refresh ``obj``; a clash on the unique ``key`` rolls back and answers 409"""
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=f"Another entry already has this {key}")
+    await db.refresh(obj)
+    return obj
 
 # Anime CRUD
-async def get_anime(db: AsyncSession, anime_id: int):
-    result = await db.execute(select(models.Anime).filter(models.Anime.id == anime_id))
-    return result.scalar_one_or_none()
+async def get_anime(db: AsyncSession, anime_id: int, columns: Optional[list] = None):
+    query = select(*columns) if columns else select(models.Anime)
+    result = await db.execute(query.filter(models.Anime.id == anime_id))
+    return result.one_or_none() if columns else result.scalar_one_or_none()
 
-async def get_all_anime(db: AsyncSession, skip: int = 0, limit: int = 100, status: Optional[str] = None):
-    query = select(models.Anime)
+async def get_all_anime(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    columns: Optional[list] = None,
+):
+    query = select(*columns) if columns else select(models.Anime)
     if status:
         query = query.filter(models.Anime.status == status)
-    query = query.offset(skip).limit(limit).order_by(models.Anime.updated_at.desc())
+    query = _page(query, models.Anime, skip, limit, after)
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all() if columns else result.scalars().all()
 
 async def search_anime(db: AsyncSession, search_term: str):
-    query = select(models.Anime).filter(
-        or_(
-            models.Anime.title.ilike(f"%{search_term}%"),
-            models.Anime.title_english.ilike(f"%{search_term}%")
-        )
+    query = (
+        select(models.Anime)
+        .join(fts.fts_table("anime"), fts.fts_table("anime").c.rowid == models.Anime.id)
+        .filter(fts.match("anime", search_term))
+        .order_by(fts.rank("anime"))
     )
     result = await db.execute(query)
     return result.scalars().all()
@@ -29,9 +206,11 @@ async def search_anime(db: AsyncSession, search_term: str):
 async def create_anime(db: AsyncSession, anime: schemas.AnimeCreate):
     db_anime = models.Anime(**anime.model_dump())
     db.add(db_anime)
-    await db.commit()
-    await db.refresh(db_anime)
-    return db_anime
+    return await _commit_unique(db, db_anime, "mal_id")
+
+async def bulk_upsert_anime(db: AsyncSession, items: List[schemas.AnimeCreate]):
+    rows = [item.model_dump(exclude_unset=True) for item in items]
+    return await _bulk_upsert(db, models.Anime, rows, key="mal_id")
 
 async def update_anime(db: AsyncSession, anime_id: int, anime: schemas.AnimeUpdate):
     db_anime = await get_anime(db, anime_id)
@@ -42,9 +221,7 @@ async def update_anime(db: AsyncSession, anime_id: int, anime: schemas.AnimeUpda
     for key, value in update_data.items():
         setattr(db_anime, key, value)
     
-    await db.commit()
-    await db.refresh(db_anime)
-    return db_anime
+    return await _commit_unique(db, db_anime, "mal_id")
 
 async def delete_anime(db: AsyncSession, anime_id: int):
     db_anime = await get_anime(db, anime_id)
@@ -55,21 +232,134 @@ async def delete_anime(db: AsyncSession, anime_id: int):
     return db_anime
 
 
+# Manga CRUD
+async def get_manga(db: AsyncSession, manga_id: int, columns: Optional[list] = None):
+    query = select(*columns) if columns else select(models.Manga)
+    result = await db.execute(query.filter(models.Manga.id == manga_id))
+    return result.one_or_none() if columns else result.scalar_one_or_none()
+
+async def get_all_manga(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    columns: Optional[list] = None,
+):
+    query = select(*columns) if columns else select(models.Manga)
+    if status and status != "all":
+        query = query.filter(models.Manga.status == status)
+    query = _page(query, models.Manga, skip, limit, after)
+    result = await db.execute(query)
+    return result.all() if columns else result.scalars().all()
+
+async def create_manga(db: AsyncSession, manga: schemas.MangaCreate):
+    db_manga = models.Manga(**manga.model_dump())
+    db.add(db_manga)
+    return await _commit_unique(db, db_manga, "mal_id")
+
+async def bulk_upsert_manga(db: AsyncSession, items: List[schemas.MangaCreate]):
+    rows = [item.model_dump(exclude_unset=True) for item in items]
+    return await _bulk_upsert(db, models.Manga, rows, key="mal_id")
+
+async def update_manga(db: AsyncSession, manga_id: int, manga: schemas.MangaUpdate):
+    db_manga = await get_manga(db, manga_id)
+    if not db_manga:
+        return None
+    
+    update_data = manga.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_manga, key, value)
+    
+    return await _commit_unique(db, db_manga, "mal_id")
+
+async def delete_manga(db: AsyncSession, manga_id: int):
+    db_manga = await get_manga(db, manga_id)
+    if not db_manga:
+        return None
+    await db.delete(db_manga)
+    await db.commit()
+    return db_manga
+
+
+# Music CRUD
+async def get_music(db: AsyncSession, music_id: int, columns: Optional[list] = None):
+    query = select(*columns) if columns else select(models.Music)
+    result = await db.execute(query.filter(models.Music.id == music_id))
+    return result.one_or_none() if columns else result.scalar_one_or_none()
+
+async def get_all_music(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    columns: Optional[list] = None,
+):
+    query = select(*columns) if columns else select(models.Music)
+    if status:
+        query = query.filter(models.Music.status == status)
+    query = _page(query, models.Music, skip, limit, after)
+    result = await db.execute(query)
+    return result.all() if columns else result.scalars().all()
+
+async def create_music(db: AsyncSession, music: schemas.MusicCreate):
+    db_music = models.Music(**music.model_dump())
+    db.add(db_music)
+    return await _commit_unique(db, db_music, "spotify_id")
+
+async def bulk_upsert_music(db: AsyncSession, items: List[schemas.MusicCreate]):
+    rows = [item.model_dump(exclude_unset=True) for item in items]
+    return await _bulk_upsert(db, models.Music, rows, key="spotify_id")
+
+async def update_music(db: AsyncSession, music_id: int, music: schemas.MusicUpdate):
+    db_music = await get_music(db, music_id)
+    if not db_music:
+        return None
+    
+    update_data = music.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_music, key, value)
+    
+    return await _commit_unique(db, db_music, "spotify_id")
+
+async def delete_music(db: AsyncSession, music_id: int):
+    db_music = await get_music(db, music_id)
+    if not db_music:
+        return None
+    await db.delete(db_music)
+    await db.commit()
+    return db_music
+
+
 # Game CRUD
-async def get_game(db: AsyncSession, game_id: int):
-    result = await db.execute(select(models.Game).filter(models.Game.id == game_id))
-    return result.scalar_one_or_none()
+async def get_game(db: AsyncSession, game_id: int, columns: Optional[list] = None):
+    query = select(*columns) if columns else select(models.Game)
+    result = await db.execute(query.filter(models.Game.id == game_id))
+    return result.one_or_none() if columns else result.scalar_one_or_none()
 
-async def get_all_games(db: AsyncSession, skip: int = 0, limit: int = 100, status: Optional[str] = None):
-    query = select(models.Game)
+async def get_all_games(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    columns: Optional[list] = None,
+):
+    query = select(*columns) if columns else select(models.Game)
     if status:
         query = query.filter(models.Game.status == status)
-    query = query.offset(skip).limit(limit).order_by(models.Game.updated_at.desc())
+    query = _page(query, models.Game, skip, limit, after)
     result = await db.execute(query)
-    return result.scalars().all()
+    return result.all() if columns else result.scalars().all()
 
 async def search_games(db: AsyncSession, search_term: str):
-    query = select(models.Game).filter(models.Game.title.ilike(f"%{search_term}%"))
+    query = (
+        select(models.Game)
+        .join(fts.fts_table("games"), fts.fts_table("games").c.rowid == models.Game.id)
+        .filter(fts.match("games", search_term))
+        .order_by(fts.rank("games"))
+    )
     result = await db.execute(query)
     return result.scalars().all()
 
@@ -80,6 +370,10 @@ async def create_game(db: AsyncSession, game: schemas.GameCreate):
     await db.refresh(db_game)
     return db_game
 
+async def bulk_upsert_games(db: AsyncSession, items: List[schemas.GameCreate]):
+    rows = [item.model_dump(exclude_unset=True) for item in items]
+    return await _bulk_upsert(db, models.Game, rows, key=None)
+
 async def update_game(db: AsyncSession, game_id: int, game: schemas.GameUpdate):
     db_game = await get_game(db, game_id)
     if not db_game:
@@ -102,35 +396,20 @@ async def delete_game(db: AsyncSession, game_id: int):
     return db_game
 
 
+# Library search
+async def search_library(db: AsyncSession, search_term: str, media_types: List[str], limit: int = 20):
+    """Best ``limit`` full-text matches across ``media_types``, lowest bm25 rank first"""
+    fts_query = fts.match_query(search_term)
+    if not fts_query:
+        return []
+    matches = []
+    for media in media_types:
+        result = await db.execute(fts.search_statement(media), {"fts_query": fts_query, "limit": limit})
+        matches.extend({"media": media, **row._mapping} for row in result)
+    return heapq.nsmallest(limit, matches, key=lambda m: m["rank"])
+
+
 # Stats
 async def get_stats(db: AsyncSession):
-    anime_count = await db.execute(select(func.count(models.Anime.id)))
-    game_count = await db.execute(select(func.count(models.Game.id)))
-    
-    anime_watching = await db.execute(
-        select(func.count(models.Anime.id)).filter(models.Anime.status == "watching")
-    )
-    anime_completed = await db.execute(
-        select(func.count(models.Anime.id)).filter(models.Anime.status == "completed")
-    )
-    
-    games_playing = await db.execute(
-        select(func.count(models.Game.id)).filter(models.Game.status == "playing")
-    )
-    games_completed = await db.execute(
-        select(func.count(models.Game.id)).filter(models.Game.status == "completed")
-    )
-    
-    total_episodes = await db.execute(select(func.sum(models.Anime.current_episode)))
-    total_playtime = await db.execute(select(func.sum(models.Game.playtime_hours)))
-    
-    return {
-        "total_anime": anime_count.scalar() or 0,
-        "total_games": game_count.scalar() or 0,
-        "anime_watching": anime_watching.scalar() or 0,
-        "anime_completed": anime_completed.scalar() or 0,
-        "games_playing": games_playing.scalar() or 0,
-        "games_completed": games_completed.scalar() or 0,
-        "total_episodes_watched": total_episodes.scalar() or 0,
-        "total_playtime_hours": total_playtime.scalar() or 0.0
-    }
\ No newline at end of file
+    result = await db.execute(select(models.MediaCounter))
+    return summarize(result.scalars().all())
@@ -1,15 +1,59 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from . import config
 from .models import Base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./app.db"
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{config.DATABASE_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{config.DATABASE_PATH}"
 
+def apply_sqlite_profile(dbapi_connection, connection_record):
+    """Connect hook applying the configured pragmas to a new connection"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA temp_store={config.SQLITE_TEMP_STORE}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def apply_reader_profile(dbapi_connection, connection_record):
+    apply_sqlite_profile(dbapi_connection, connection_record)
+    # Readers can never take the write lock by accident
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+# Sync engine: schema setup, counters and command-line scripts
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+event.listen(engine, "connect", apply_sqlite_profile)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engines used by the API. SQLite allows one writer at a time, so writes
+# share a single pooled connection and queue for it in-process instead of
+# contending for the file lock; under WAL the reader pool never waits on them.
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=1, max_overflow=0
+)
+event.listen(async_engine.sync_engine, "connect", apply_sqlite_profile)
+
+async_read_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=config.SQLITE_READER_POOL_SIZE, max_overflow=0
+)
+event.listen(async_read_engine.sync_engine, "connect", apply_reader_profile)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -17,6 +61,14 @@ def get_db():
     finally:
         db.close()
 
+async def get_write_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
@@ -24,4 +76,4 @@ def create_tables():
 # Run this to create tables
 if __name__ == "__main__":
     create_tables()
-    print("Tables created successfully!")
\ No newline at end of file
+    print("Tables created successfully!")
@@ -0,0 +1,182 @@
+"""Fill in details of newly added anime and manga from Jikan.
+
+Creating or updating a title with a ``mal_id`` queues it here and returns
+straight away. A few workers fetch the Jikan details through the response
+cache at background priority, so the scheduler's rate limit, request
+coalescing and cached details all apply, and a title queued twice is fetched
+once. Results are written in batches that only fill columns which are still
+empty, so nothing the client sent is overwritten. Failed fetches and failed
+batch writes are retried with exponential backoff.
+
+The queue lives in memory; titles queued when the process stops are not
+picked up again until they are next created or updated.
+"""
+import asyncio
+from typing import Dict, List, Set, Tuple
+
+from fastapi import Request
+from sqlalchemy import bindparam, func, update
+
+from . import cache, config, models
+from .cache import ResponseCache
+from .database import AsyncSessionLocal
+from .jikan import BACKGROUND, JikanScheduler
+
+def anime_details(data: dict) -> dict:
+    return {
+        "title_english": data.get("title_english"),
+        "synopsis": data.get("synopsis"),
+        "image_url": data["images"]["jpg"]["large_image_url"],
+        "episodes": data.get("episodes"),
+    }
+
+def manga_details(data: dict) -> dict:
+    return {
+        "image_url": data["images"]["jpg"]["large_image_url"],
+        "total_chapters": data.get("chapters"),
+        "total_volumes": data.get("volumes"),
+    }
+
+# Model and Jikan detail shape per media
+ENRICHED = {
+    "anime": (models.Anime, anime_details),
+    "manga": (models.Manga, manga_details),
+}
+
+# Columns filled in, when still empty
+COLUMNS = {
+    "anime": ("title_english", "synopsis", "image_url", "episodes"),
+    "manga": ("image_url", "total_chapters", "total_volumes"),
+}
+
+def needs_enrichment(media: str, item) -> bool:
+    """Whether ``item`` has a mal_id and any column enrichment could fill"""
+    return item.mal_id is not None and any(getattr(item, column) is None for column in COLUMNS[media])
+
+class Enricher:
+    def __init__(
+        self,
+        jikan: JikanScheduler,
+        response_cache: ResponseCache,
+        workers: int = config.ENRICH_WORKERS,
+        batch_size: int = config.ENRICH_BATCH_SIZE,
+        flush_interval: float = config.ENRICH_FLUSH_INTERVAL,
+        max_attempts: int = config.ENRICH_MAX_ATTEMPTS,
+        backoff_base: float = config.ENRICH_BACKOFF_BASE,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.jikan = jikan
+        self.response_cache = response_cache
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._results: asyncio.Queue = asyncio.Queue()
+        # (media, mal_id) queued, being fetched or waiting for a retry
+        self._pending: Set[Tuple[str, int]] = set()
+        self._retries: Set[asyncio.TimerHandle] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._writer()))
+
+    def enqueue(self, media: str, mal_id: int):
+        key = (media, mal_id)
+        if key not in self._pending:
+            self._pending.add(key)
+            self._queue.put_nowait((media, mal_id, 0))
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def _worker(self):
+        while True:
+            media, mal_id, attempt = await self._queue.get()
+            try:
+                response = await self.response_cache.get(
+                    self.jikan, f"/{media}/{mal_id}", policy=cache.DETAILS, priority=BACKGROUND,
+                )
+                if response.status_code == 404:
+                    print(f"[ENRICH] {media} {mal_id} not found on MyAnimeList")
+                    self._pending.discard((media, mal_id))
+                    continue
+                if response.status_code != 200:
+                    raise RuntimeError(f"Jikan answered {response.status_code}")
+                details = ENRICHED[media][1](response.json()["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._retry(media, mal_id, attempt, e)
+                continue
+            self._results.put_nowait((media, mal_id, attempt, details))
+
+    def _retry(self, media: str, mal_id: int, attempt: int, error: Exception):
+        if attempt + 1 >= self.max_attempts:
+            print(f"[ENRICH] Giving up on {media} {mal_id}: {error}")
+            self._pending.discard((media, mal_id))
+            return
+        delay = self.backoff_base * 2 ** attempt
+
+        def requeue():
+            self._retries.discard(handle)
+            self._queue.put_nowait((media, mal_id, attempt + 1))
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retries.add(handle)
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._results.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._results.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            except Exception as e:
+                print(f"[ENRICH] Writing {len(batch)} titles failed: {e}")
+                # Refetched details usually come straight from the response cache
+                for media, mal_id, attempt, _ in batch:
+                    self._retry(media, mal_id, attempt, e)
+                continue
+            for media, mal_id, _, _ in batch:
+                self._pending.discard((media, mal_id))
+
+    async def _write(self, batch: List[Tuple[str, int, int, dict]]):
+        """One executemany UPDATE per media, filling only columns that are still NULL"""
+        by_media: Dict[str, List[dict]] = {}
+        for media, mal_id, _, details in batch:
+            by_media.setdefault(media, []).append(
+                {"match_mal_id": mal_id, **{f"new_{column}": value for column, value in details.items()}}
+            )
+        async with self._session_factory() as db:
+            for media, params in by_media.items():
+                table = ENRICHED[media][0].__table__
+                stmt = (
+                    update(table)
+                    .where(table.c.mal_id == bindparam("match_mal_id"))
+                    .values({
+                        column: func.coalesce(table.c[column], bindparam(f"new_{column}"))
+                        for column in COLUMNS[media]
+                    })
+                )
+                await db.execute(stmt, params)
+            await db.commit()
+
+    async def aclose(self):
+        for handle in self._retries:
+            handle.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+def get_enricher(request: Request) -> Enricher:
+    """Dependency returning the enricher started in the app lifespan"""
+    return request.app.state.enricher
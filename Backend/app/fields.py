@@ -0,0 +1,50 @@
+"""Sparse fieldsets for the media list and detail endpoints.
+
+``?fields=`` takes field names and presets, comma separated, e.g.
+``?fields=card`` or ``?fields=card,notes``. Only the requested columns are
+selected, so large Text columns like ``synopsis`` and ``notes`` are neither
+read nor serialized unless asked for. Without it every field is returned.
+"""
+from typing import Optional, Tuple, Type
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+# Always selected: the keyset cursor is built from them
+KEY_FIELDS = ("id", "updated_at")
+
+class FieldSet:
+    """The fields of ``schema`` a client may ask for, backed by ``model`` columns"""
+
+    def __init__(self, model, schema: Type[BaseModel], **presets: Tuple[str, ...]):
+        self.names = tuple(schema.model_fields)
+        self.presets = {"full": self.names, **presets}
+        self._columns = {name: getattr(model, name).label(name) for name in self.names}
+
+    def resolve(self, fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """Requested field names in schema order, or None for every field; raises a 400 for unknown ones
+
+        None lets ``responses`` serialize whole rows through ``_asdict`` instead of
+        picking fields one by one.
+        """
+        if not fields:
+            return None
+        requested = set()
+        for name in filter(None, (part.strip() for part in fields.split(","))):
+            if name in self.presets:
+                requested.update(self.presets[name])
+            elif name in self._columns:
+                requested.add(name)
+            else:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown field '{name}', expected one of: {', '.join([*self.presets, *self.names])}",
+                )
+        names = tuple(name for name in self.names if name in requested)
+        return None if names == self.names else names
+
+    def columns(self, names: Optional[Tuple[str, ...]]) -> list:
+        """Columns to select for ``names``; every column when None"""
+        if names is None:
+            return list(self._columns.values())
+        return [self._columns[name] for name in self.names if name in names or name in KEY_FIELDS]
@@ -0,0 +1,115 @@
+"""SQLite FTS5 full-text indexes over the local library.
+
+Each media table has an external-content FTS5 table kept in sync by triggers,
+so searches are ranked index lookups instead of ``LIKE '%term%'`` scans.
+Rebuild every index from its table with:
+
+    python -m app.fts
+"""
+import re
+from sqlalchemy import column, table, text
+from .database import engine
+
+# Indexed columns per media table, with their bm25 weights (title counts most)
+FTS_TABLES = {
+    "anime": {"columns": ["title", "title_english", "synopsis", "notes"], "weights": [10.0, 8.0, 1.0, 2.0]},
+    "manga": {"columns": ["title", "notes"], "weights": [10.0, 2.0]},
+    "games": {"columns": ["title", "notes"], "weights": [10.0, 2.0]},
+    "music": {"columns": ["title", "artist", "album", "notes"], "weights": [10.0, 6.0, 4.0, 2.0]},
+}
+
+def fts_name(media: str) -> str:
+    return f"{media}_fts"
+
+def fts_table(media: str):
+    """Lightweight table construct for joining an FTS table on rowid"""
+    return table(fts_name(media), column("rowid"))
+
+def match_query(term: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+    words = re.findall(r"\w+", term)
+    if not words:
+        return ""
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def match(media: str, term: str):
+    return text(f"{fts_name(media)} MATCH :fts_query").bindparams(fts_query=match_query(term))
+
+def rank(media: str):
+    weights = ", ".join(str(w) for w in FTS_TABLES[media]["weights"])
+    return text(f"bm25({fts_name(media)}, {weights})")
+
+def _ddl(media: str):
+    name = fts_name(media)
+    cols = FTS_TABLES[media]["columns"]
+    col_list = ", ".join(cols)
+    new_values = ", ".join(f"new.{c}" for c in cols)
+    old_values = ", ".join(f"old.{c}" for c in cols)
+    yield name, f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5(
+            {col_list}, content='{media}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """
+    yield f"trg_{name}_insert", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_insert AFTER INSERT ON {media} BEGIN
+            INSERT INTO {name} (rowid, {col_list}) VALUES (new.id, {new_values});
+        END
+    """
+    yield f"trg_{name}_delete", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_delete AFTER DELETE ON {media} BEGIN
+            INSERT INTO {name} ({name}, rowid, {col_list}) VALUES ('delete', old.id, {old_values});
+        END
+    """
+    yield f"trg_{name}_update", f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_update AFTER UPDATE OF {col_list} ON {media} BEGIN
+            INSERT INTO {name} ({name}, rowid, {col_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {name} (rowid, {col_list}) VALUES (new.id, {new_values});
+        END
+    """
+
+def search_statement(media: str):
+    """Ranked, highlighted matches from one media table; binds :fts_query and :limit"""
+    name = fts_name(media)
+    image = "cover_url" if media == "games" else "image_url"
+    weights = ", ".join(str(w) for w in FTS_TABLES[media]["weights"])
+    return text(f"""
+        SELECT m.id, m.title, m.{image} AS image_url, m.status,
+               bm25({name}, {weights}) AS rank,
+               highlight({name}, 0, '<mark>', '</mark>') AS title_highlight,
+               snippet({name}, -1, '<mark>', '</mark>', '…', 12) AS snippet
+        FROM {name} JOIN {media} AS m ON m.id = {name}.rowid
+        WHERE {name} MATCH :fts_query
+        ORDER BY rank
+        LIMIT :limit
+    """)
+
+def _rebuild(conn, media: str):
+    conn.execute(text(f"INSERT INTO {fts_name(media)} ({fts_name(media)}) VALUES ('rebuild')"))
+
+def rebuild_fts(bind=engine):
+    with bind.begin() as conn:
+        for media in FTS_TABLES:
+            _rebuild(conn, media)
+
+def install_fts(bind=engine):
+    """Create the FTS tables and triggers, indexing existing rows for any new table"""
+    with bind.begin() as conn:
+        existing = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )).scalars())
+        for media in FTS_TABLES:
+            created = False
+            for name, ddl in _ddl(media):
+                if name not in existing:
+                    conn.execute(text(ddl))
+                    created = True
+            if created:
+                _rebuild(conn, media)
+
+# Run this to reindex the library
+if __name__ == "__main__":
+    rebuild_fts()
+    print("Search indexes rebuilt successfully!")
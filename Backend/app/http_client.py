@@ -0,0 +1,64 @@
+import httpx
+from fastapi import Request
+from . import config
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def create_jikan_client() -> httpx.AsyncClient:
+    """Build the application-wide pooled client for api.jikan.moe"""
+    return httpx.AsyncClient(
+        base_url=config.JIKAN_API_BASE,
+        http2=config.JIKAN_HTTP2 and _http2_available(),
+        timeout=httpx.Timeout(config.JIKAN_READ_TIMEOUT, connect=config.JIKAN_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=config.JIKAN_MAX_CONNECTIONS,
+            max_keepalive_connections=config.JIKAN_MAX_KEEPALIVE,
+            keepalive_expiry=config.JIKAN_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+def get_jikan_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the client opened in the app lifespan"""
+    return request.app.state.jikan_client
+
+def create_mal_client() -> httpx.AsyncClient:
+    """Pooled client for the official MyAnimeList API, authenticated by client ID"""
+    return httpx.AsyncClient(
+        base_url=config.MAL_API_BASE,
+        headers={"X-MAL-CLIENT-ID": config.MAL_CLIENT_ID},
+        timeout=httpx.Timeout(config.JIKAN_READ_TIMEOUT, connect=config.JIKAN_CONNECT_TIMEOUT),
+    )
+
+def create_spotify_http_client() -> httpx.AsyncClient:
+    """Pooled client for api.spotify.com; tokens are sent per request"""
+    return httpx.AsyncClient(
+        base_url=config.SPOTIFY_API_BASE,
+        timeout=httpx.Timeout(config.SPOTIFY_READ_TIMEOUT, connect=config.SPOTIFY_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=config.SPOTIFY_MAX_CONNECTIONS,
+            max_keepalive_connections=config.SPOTIFY_MAX_KEEPALIVE,
+        ),
+    )
+
+def create_image_http_client(check_host) -> httpx.AsyncClient:
+    """Pooled client for the image CDNs behind /images
+
+    ``check_host`` runs on every request, redirects included, and raises to
+    refuse hosts the proxy may not reach.
+    """
+
+    async def on_request(request: httpx.Request):
+        check_host(request.url.host)
+
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        max_redirects=3,
+        timeout=httpx.Timeout(config.IMAGE_READ_TIMEOUT, connect=config.IMAGE_CONNECT_TIMEOUT),
+        event_hooks={"request": [on_request]},
+    )
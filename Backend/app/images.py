@@ -0,0 +1,246 @@
+"""Cover art proxy with an on-disk thumbnail cache, behind /images.
+
+A source URL is fetched once and stored under the sha256 of its bytes, so the
+same picture behind several URLs is kept once. Thumbnails are cut from that
+blob per (width, format) in a process pool, keeping Pillow's CPU work off the
+event loop. Every file sits in IMAGE_CACHE_DIR and is evicted least recently
+used first once the cache outgrows IMAGE_CACHE_MAX_BYTES; a file's mtime is
+its last use, so the order survives restarts.
+
+Without Pillow installed the proxy still caches and serves the originals.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional
+
+import httpx
+from fastapi import Request
+
+from . import config, models
+from .cache import TTLCache
+from .database import AsyncReadSessionLocal, AsyncSessionLocal
+from .http_client import create_image_http_client
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - thumbnails need Pillow
+    Image = None
+
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+class ImageError(Exception):
+    """The source image could not be fetched; ``status`` is the HTTP status to answer"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class CachedImage(NamedTuple):
+    path: str
+    media_type: str
+    etag: str
+
+def host_allowed(host: str, allowed=config.IMAGE_ALLOWED_HOSTS) -> bool:
+    host = (host or "").lower()
+    return any(host == a or host.endswith("." + a) for a in allowed)
+
+def _check_host(host: str):
+    if not host_allowed(host):
+        raise ImageError(403, f"Images from {host} are not proxied")
+
+def snap_width(width: int, widths=config.IMAGE_WIDTHS) -> int:
+    """Round ``width`` up to a configured width, so the cache holds few variants"""
+    return next((w for w in widths if w >= width), widths[-1])
+
+def make_thumbnail(source: str, target: str, width: int, fmt: str, quality: int) -> int:
+    """Write a ``width``-wide copy of ``source`` to ``target``; runs in a worker process"""
+    with Image.open(source) as image:
+        # JPEG sources decode straight at a reduced scale
+        image.draft("RGB", (width, width * 4))
+        if image.width > width:
+            image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if fmt == "jpeg" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        partial = f"{target}.{os.getpid()}.part"
+        image.save(partial, format=fmt.upper(), quality=quality)
+    os.replace(partial, target)
+    return os.path.getsize(target)
+
+class ImageCache:
+    def __init__(
+        self,
+        root: str = config.IMAGE_CACHE_DIR,
+        max_bytes: int = config.IMAGE_CACHE_MAX_BYTES,
+        workers: int = config.IMAGE_WORKERS,
+        http: Optional[httpx.AsyncClient] = None,
+        session_factory=AsyncSessionLocal,
+        read_session_factory=AsyncReadSessionLocal,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.http = http or create_image_http_client(_check_host)
+        self._owns_http = http is None
+        self._pool = ProcessPoolExecutor(max_workers=workers) if Image is not None else None
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        # url -> (digest, content type)
+        self._sources = TTLCache(4096)
+        # path relative to root -> size, least recently used first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def start(self):
+        os.makedirs(self.root, exist_ok=True)
+        files = await asyncio.to_thread(self._scan)
+        for name, size in files:
+            self._files[name] = size
+            self._total += size
+        if Image is None:
+            print("[IMAGES] Pillow is not installed, serving originals without thumbnails")
+        print(f"[IMAGES] {len(self._files)} cached files, {self._total // (1024 * 1024)} MiB")
+
+    def _scan(self):
+        found = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.endswith(".part"):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.relpath(path, self.root), stat.st_size))
+        return [(name, size) for _, name, size in sorted(found)]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _touch(self, name: str) -> bool:
+        """Mark a cached file as just used; False when it is not on disk"""
+        if name not in self._files:
+            return False
+        try:
+            os.utime(self._path(name))
+        except FileNotFoundError:
+            self._total -= self._files.pop(name)
+            return False
+        self._files.move_to_end(name)
+        return True
+
+    def _add(self, name: str, size: int):
+        self._total += size - self._files.pop(name, 0)
+        self._files[name] = size
+        # Never evict the file that was just added
+        while self._total > self.max_bytes and len(self._files) > 1:
+            oldest, oldest_size = self._files.popitem(last=False)
+            self._total -= oldest_size
+            try:
+                os.remove(self._path(oldest))
+            except FileNotFoundError:
+                pass
+
+    async def _once(self, key: str, make):
+        """Run ``make()`` once per key however many requests want it at the same time"""
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(make())
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def get(self, url: str, width: Optional[int] = None, fmt: Optional[str] = None) -> CachedImage:
+        """The cached original, or its thumbnail when ``width`` and ``fmt`` are given"""
+        digest, content_type = await self._source(url)
+        original = CachedImage(self._path(f"{digest[:2]}/{digest}"), content_type, f'"{digest}"')
+        if width is None or self._pool is None:
+            return original
+
+        name = f"{digest[:2]}/{digest}-{width}.{fmt}"
+        thumbnail = CachedImage(self._path(name), FORMATS[fmt], f'"{digest}-{width}-{fmt}"')
+        if self._touch(name):
+            return thumbnail
+        try:
+            await self._once(name, lambda: self._make_thumbnail(digest, name, width, fmt))
+        except Exception as e:
+            # Formats Pillow cannot read (e.g. SVG) are served as they are
+            print(f"[IMAGES] Thumbnail failed for {url}: {e}")
+            return original
+        return thumbnail
+
+    async def _make_thumbnail(self, digest: str, name: str, width: int, fmt: str):
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(
+            self._pool, make_thumbnail,
+            self._path(f"{digest[:2]}/{digest}"), self._path(name), width, fmt, config.IMAGE_QUALITY,
+        )
+        self._add(name, size)
+
+    async def _source(self, url: str):
+        source = self._sources.get(url)
+        if source is not None and self._touch(f"{source[0][:2]}/{source[0]}"):
+            return source
+        return await self._once(url, lambda: self._resolve(url))
+
+    async def _resolve(self, url: str):
+        async with self._read_session_factory() as db:
+            row = await db.get(models.ImageSource, url)
+        if row is not None and self._touch(f"{row.digest[:2]}/{row.digest}"):
+            source = (row.digest, row.content_type)
+        else:
+            # Never fetched, or evicted since
+            source = await self._fetch(url)
+        self._sources.set(url, source)
+        return source
+
+    async def _fetch(self, url: str):
+        try:
+            async with self.http.stream("GET", url) as response:
+                if response.status_code != 200:
+                    raise ImageError(502, f"Image source answered {response.status_code}")
+                content_type = response.headers.get("content-type", "").split(";")[0].strip()
+                if not content_type.startswith("image/"):
+                    raise ImageError(502, "Image source did not return an image")
+                body = bytearray()
+                async for chunk in response.aiter_bytes():
+                    body += chunk
+                    if len(body) > config.IMAGE_MAX_SOURCE_BYTES:
+                        raise ImageError(502, "Image source is too large")
+        except httpx.HTTPError as e:
+            raise ImageError(502, f"Image source unreachable: {e}")
+
+        digest = hashlib.sha256(body).hexdigest()
+        name = f"{digest[:2]}/{digest}"
+        if not self._touch(name):
+            await asyncio.to_thread(self._write, name, bytes(body))
+            self._add(name, len(body))
+
+        async with self._session_factory() as db:
+            await db.merge(models.ImageSource(url=url, digest=digest, content_type=content_type, fetched_at=time.time()))
+            await db.commit()
+        return digest, content_type
+
+    def _write(self, name: str, data: bytes):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+
+    async def aclose(self):
+        for task in list(self._pending.values()):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        if self._owns_http:
+            await self.http.aclose()
+
+def get_image_cache(request: Request) -> ImageCache:
+    """Dependency returning the image cache created in the app lifespan"""
+    return request.app.state.images
@@ -0,0 +1,212 @@
+"""Central scheduler for all Jikan traffic.
+
+Requests are queued by priority and released through a token-bucket limiter
+that respects both of Jikan's limits. A 429 pauses the whole scheduler for
+Retry-After before retrying, and identical concurrent requests share a single
+upstream call.
+"""
+import asyncio
+import itertools
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import HTTPException, Request
+
+from . import config
+
+# Lower value is served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class JikanRateLimited(httpx.HTTPError):
+    """Jikan kept answering 429 after every retry"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("Jikan rate limit exceeded")
+        self.retry_after = retry_after
+
+def rate_limited(e: JikanRateLimited) -> HTTPException:
+    """The 503 to answer when Jikan keeps rate limiting us"""
+    return HTTPException(
+        status_code=503,
+        detail="MyAnimeList is rate limiting requests, try again shortly",
+        headers={"Retry-After": str(int(e.retry_after or 1))},
+    )
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """Grants a request only when every bucket has a token to spare"""
+
+    def __init__(self, *buckets: TokenBucket):
+        self.buckets = buckets
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                for bucket in self.buckets:
+                    bucket.refill(now)
+                wait = max(bucket.wait_time() for bucket in self.buckets)
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.tokens -= 1
+                    return
+                await asyncio.sleep(wait)
+
+def jikan_rate_limiter() -> RateLimiter:
+    return RateLimiter(
+        TokenBucket(config.JIKAN_RATE_PER_SECOND, config.JIKAN_RATE_PER_SECOND),
+        TokenBucket(config.JIKAN_RATE_PER_MINUTE / 60.0, config.JIKAN_RATE_PER_MINUTE),
+    )
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class _Job:
+    __slots__ = ("path", "params", "headers", "future", "started")
+
+    def __init__(self, path, params, headers, future):
+        self.path = path
+        self.params = params
+        self.headers = headers
+        self.future = future
+        self.started = False
+
+class JikanScheduler:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        limiter: Optional[RateLimiter] = None,
+        workers: int = config.JIKAN_WORKERS,
+        max_retries: int = config.JIKAN_MAX_RETRIES,
+        backoff_base: float = config.JIKAN_BACKOFF_BASE,
+    ):
+        self.client = client
+        self.limiter = limiter or jikan_rate_limiter()
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.upstream_calls = 0
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._inflight: Dict[Any, _Job] = {}
+        self._tasks = []
+        self._cooldown_until = 0.0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for job in list(self._inflight.values()):
+            if not job.future.done():
+                job.future.cancel()
+
+    async def get(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        priority: int = INTERACTIVE,
+    ) -> httpx.Response:
+        """Queue a GET and wait for its response, sharing identical in-flight calls"""
+        key = (path, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        job = self._inflight.get(key)
+        if job is None:
+            future = asyncio.get_running_loop().create_future()
+            # Keep an unobserved failure from being logged as "never retrieved"
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+            job = self._inflight[key] = _Job(path, params, headers, future)
+            self._queue.put_nowait((priority, next(self._seq), job))
+        elif not job.started:
+            # A higher-priority caller joined: queue the job again at its priority
+            self._queue.put_nowait((priority, next(self._seq), job))
+        return await asyncio.shield(job.future)
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.started or job.future.done():
+                continue
+            job.started = True
+            try:
+                response = await self._send(job)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(response)
+
+    async def _send(self, job: _Job) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            delay = self._cooldown_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.limiter.acquire()
+
+            self.upstream_calls += 1
+            try:
+                response = await self.client.get(job.path, params=job.params, headers=job.headers)
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            retry_after = retry_after_seconds(response)
+            if attempt == self.max_retries:
+                break
+            delay = retry_after if retry_after is not None else self._backoff(attempt)
+            if response.status_code == 429:
+                # The limit is global, so hold back every worker, not just this one
+                self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            await asyncio.sleep(delay)
+
+        if response.status_code == 429:
+            raise JikanRateLimited(retry_after)
+        return response
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random() / 2)
+
+def get_jikan(request: Request) -> JikanScheduler:
+    """Dependency returning the scheduler started in the app lifespan"""
+    return request.app.state.jikan
@@ -1,21 +1,78 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine, Base
-from . import models
+from .database import async_engine, async_read_engine, engine, Base
+from . import config, models
+from .counters import install_counters
+from .fts import install_fts
+from .migrations import run_migrations
+from .pagination import NEXT_CURSOR_HEADER
+from .cache import ResponseCache
+from .http_client import create_jikan_client, create_mal_client, create_spotify_http_client
+from .enrichment import Enricher
+from .images import ImageCache
+from .jikan import JikanScheduler
+from .mal_import import MALImporter
+from .refresh import AiringRefresher
+from .spotify_client import SpotifyClients
+from .spotify_sync import SpotifyMirror
 
 # Import routers individually
 from .routers import anime
 from .routers import manga
+from .routers import games
 from .routers import music
 from .routers import mal
 from .routers import trending
 from .routers import stats
+from .routers import search
 from .routers import spotify
+from .routers import images
 
 # Create tables
 models.Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+install_counters(engine)
+install_fts(engine)
 
-app = FastAPI(title="Media Tracker API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client per process, shared by every Jikan handler
+    app.state.jikan_client = create_jikan_client()
+    app.state.jikan = JikanScheduler(app.state.jikan_client)
+    app.state.jikan.start()
+    app.state.response_cache = ResponseCache()
+    await app.state.response_cache.purge()
+    app.state.enricher = Enricher(app.state.jikan, app.state.response_cache)
+    app.state.enricher.start()
+    app.state.airing_refresher = AiringRefresher(app.state.jikan, app.state.response_cache)
+    if config.REFRESH_ENABLED:
+        app.state.airing_refresher.start()
+    app.state.mal_client = create_mal_client()
+    app.state.mal_importer = MALImporter(app.state.mal_client)
+    await app.state.mal_importer.mark_interrupted()
+    app.state.spotify_http = create_spotify_http_client()
+    app.state.spotify = SpotifyClients(app.state.spotify_http)
+    app.state.spotify_mirror = SpotifyMirror()
+    app.state.images = ImageCache()
+    await app.state.images.start()
+    try:
+        yield
+    finally:
+        await app.state.images.aclose()
+        await app.state.spotify_mirror.aclose()
+        await app.state.mal_importer.aclose()
+        await app.state.mal_client.aclose()
+        await app.state.spotify_http.aclose()
+        await app.state.airing_refresher.aclose()
+        await app.state.enricher.aclose()
+        await app.state.response_cache.aclose()
+        await app.state.jikan.aclose()
+        await app.state.jikan_client.aclose()
+        await async_engine.dispose()
+        await async_read_engine.dispose()
+
+app = FastAPI(title="Media Tracker API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -24,16 +81,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 # Include routers
 app.include_router(anime.router)
 app.include_router(manga.router)
 app.include_router(music.router)
+app.include_router(games.router)
 app.include_router(spotify.router)
 app.include_router(mal.router)
 app.include_router(trending.router)
 app.include_router(stats.router)
+app.include_router(search.router)
+app.include_router(images.router)
 
 @app.get("/")
 def read_root():
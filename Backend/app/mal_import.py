@@ -0,0 +1,206 @@
+"""Import a MyAnimeList user's anime or manga list into the library.
+
+Jikan no longer serves user lists, so pages come from the official MAL API
+(set MAL_CLIENT_ID). Up to MAL_IMPORT_CONCURRENCY pages are fetched at once
+through a token bucket, and each page is upserted on ``mal_id`` together with
+the job's progress as soon as it arrives. Only the pages in flight are held in
+memory, and a failed or interrupted job resumes at the first unwritten page.
+"""
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Dict
+from urllib.parse import quote
+
+import httpx
+from fastapi import Request
+from sqlalchemy import update
+
+from . import config, crud, models
+from .database import AsyncSessionLocal
+from .jikan import RETRY_STATUSES, RateLimiter, TokenBucket, retry_after_seconds
+
+# Extra fields requested for each list entry
+LIST_FIELDS = {
+    "anime": "list_status,num_episodes,alternative_titles,synopsis",
+    "manga": "list_status,num_chapters,num_volumes",
+}
+
+class MALImportError(Exception):
+    """MyAnimeList refused a list page; the message is stored on the job"""
+
+def _describe(response: httpx.Response) -> str:
+    if response.status_code == 404:
+        return "MyAnimeList user not found"
+    if response.status_code == 403:
+        return "This MyAnimeList list is private"
+    if response.status_code in (400, 401):
+        return "MyAnimeList rejected the request, check MAL_CLIENT_ID"
+    return f"MyAnimeList answered {response.status_code}"
+
+def _picture(node: dict):
+    picture = node.get("main_picture") or {}
+    return picture.get("large") or picture.get("medium")
+
+def anime_row(entry: dict) -> dict:
+    node, status = entry["node"], entry.get("list_status") or {}
+    return {
+        "mal_id": node["id"],
+        "title": node["title"],
+        "title_english": (node.get("alternative_titles") or {}).get("en") or None,
+        "synopsis": node.get("synopsis") or None,
+        "image_url": _picture(node),
+        "episodes": node.get("num_episodes") or None,
+        "current_episode": status.get("num_episodes_watched", 0),
+        "status": status.get("status", "plan_to_watch"),
+        "user_score": status.get("score") or None,
+    }
+
+def manga_row(entry: dict) -> dict:
+    node, status = entry["node"], entry.get("list_status") or {}
+    return {
+        "mal_id": node["id"],
+        "title": node["title"],
+        "image_url": _picture(node),
+        "total_chapters": node.get("num_chapters") or None,
+        "total_volumes": node.get("num_volumes") or None,
+        "current_chapter": status.get("num_chapters_read", 0),
+        "current_volume": status.get("num_volumes_read", 0),
+        "status": status.get("status", "plan_to_read"),
+        "rating": float(status.get("score") or 0),
+    }
+
+IMPORTERS = {
+    "anime": (models.Anime, anime_row),
+    "manga": (models.Manga, manga_row),
+}
+
+class MALImporter:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        limiter: RateLimiter = None,
+        page_size: int = config.MAL_IMPORT_PAGE_SIZE,
+        concurrency: int = config.MAL_IMPORT_CONCURRENCY,
+        max_retries: int = config.JIKAN_MAX_RETRIES,
+        backoff_base: float = config.JIKAN_BACKOFF_BASE,
+        session_factory=AsyncSessionLocal,
+    ):
+        self.client = client
+        self.limiter = limiter or RateLimiter(TokenBucket(config.MAL_RATE_PER_SECOND, config.MAL_RATE_PER_SECOND))
+        self.page_size = page_size
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._session_factory = session_factory
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    def is_running(self, job_id: int) -> bool:
+        return job_id in self._tasks
+
+    def start(self, job_id: int):
+        """Run a job in the background from its saved offset"""
+        if job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _fetch_page(self, username: str, media: str, offset: int) -> list:
+        params = {"fields": LIST_FIELDS[media], "limit": self.page_size, "offset": offset, "nsfw": "true"}
+        path = f"/users/{quote(username, safe='')}/{media}list"
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            response = await self.client.get(path, params=params)
+            if response.status_code == 200:
+                return response.json().get("data", [])
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(retry_after_seconds(response) or self.backoff_base * 2 ** attempt)
+                continue
+            raise MALImportError(_describe(response))
+
+    async def _run(self, job_id: int):
+        async with self._session_factory() as db:
+            job = await db.get(models.ImportJob, job_id)
+            username, media, offset = job.username, job.media, job.next_offset
+
+        pending = deque()
+        next_offset = offset
+
+        def schedule():
+            nonlocal next_offset
+            pending.append((next_offset, asyncio.create_task(self._fetch_page(username, media, next_offset))))
+            next_offset += self.page_size
+
+        # The first page alone tells whether there is more, so short lists cost one request
+        schedule()
+        try:
+            while pending:
+                page_offset, task = pending.popleft()
+                entries = await task
+                last = len(entries) < self.page_size
+                if last:
+                    for _, other in pending:
+                        other.cancel()
+                    pending.clear()
+                else:
+                    while len(pending) < self.concurrency:
+                        schedule()
+                await self._write_page(job_id, media, page_offset, entries, last)
+        except asyncio.CancelledError:
+            for _, other in pending:
+                other.cancel()
+            raise
+        except Exception as e:
+            for _, other in pending:
+                other.cancel()
+            print(f"[MAL IMPORT] Job {job_id} failed: {e}")
+            await self._set_status(job_id, "failed", error=str(e) or type(e).__name__)
+
+    async def _write_page(self, job_id: int, media: str, offset: int, entries: list, last: bool):
+        """Upsert one page and advance the job in the same transaction"""
+        model, to_row = IMPORTERS[media]
+        async with self._session_factory() as db:
+            summary = await crud._bulk_upsert(db, model, [to_row(e) for e in entries], key="mal_id", commit=False)
+            job = models.ImportJob
+            values = {
+                "next_offset": offset + len(entries),
+                "pages": job.pages + 1,
+                "imported": job.imported + len(entries),
+                "created": job.created + summary["created"],
+                "updated": job.updated + summary["updated"],
+                "updated_at": datetime.utcnow(),
+            }
+            if last:
+                values.update(status="completed", finished_at=datetime.utcnow())
+            await db.execute(update(job).where(job.id == job_id).values(**values))
+            await db.commit()
+
+    async def _set_status(self, job_id: int, status: str, error: str = None):
+        async with self._session_factory() as db:
+            job = models.ImportJob
+            await db.execute(update(job).where(job.id == job_id).values(
+                status=status, error=error, updated_at=datetime.utcnow(),
+            ))
+            await db.commit()
+
+    async def mark_interrupted(self) -> int:
+        """Flag jobs left running by a previous process so they can be resumed"""
+        async with self._session_factory() as db:
+            job = models.ImportJob
+            result = await db.execute(update(job).where(
+                job.status == "running", job.id.not_in(list(self._tasks)),
+            ).values(status="interrupted", updated_at=datetime.utcnow()))
+            await db.commit()
+            return result.rowcount
+
+    async def aclose(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.mark_interrupted()
+
+def get_mal_importer(request: Request) -> MALImporter:
+    """Dependency returning the importer created in the app lifespan"""
+    return request.app.state.mal_importer
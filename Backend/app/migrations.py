@@ -0,0 +1,107 @@
+"""Bring an existing app.db up to the current schema.
+
+``create_all`` only creates missing tables, so columns and indexes added to
+existing tables are created here. Safe to run repeatedly:
+
+    python -m app.migrations
+
+Library data is never changed on the way. If several rows share a mal_id or
+spotify_id, its unique index is not created and the conflicting ids are
+listed; fix them by hand, or let the migration keep each ID on its most
+recently updated row and clear it on the others:
+
+    python -m app.migrations --release-duplicates
+"""
+import argparse
+from typing import Dict, List
+
+from sqlalchemy import text
+from .database import engine
+from .models import Base
+
+# (table, column) pairs that must be unique before their unique index is built
+EXTERNAL_IDS = [("anime", "mal_id"), ("manga", "mal_id"), ("music", "spotify_id")]
+
+def _duplicate_external_ids(conn, table: str, column: str) -> Dict[str, List[int]]:
+    """Each external ID held by more than one row, with those rows' ids"""
+    rows = conn.execute(text(f"""
+        SELECT {column}, group_concat(id) FROM {table}
+        WHERE {column} IS NOT NULL
+        GROUP BY {column} HAVING count(*) > 1
+    """))
+    return {str(value): sorted(int(i) for i in ids.split(",")) for value, ids in rows}
+
+def _release_duplicate_external_ids(conn, table: str, column: str) -> int:
+    """Keep each external ID on its most recently updated row and clear it elsewhere
+
+    Older duplicates keep all their data, they only lose the link.
+    """
+    result = conn.execute(text(f"""
+        UPDATE {table} SET {column} = NULL
+        WHERE {column} IS NOT NULL AND id NOT IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY {column} ORDER BY updated_at DESC, id DESC
+                ) AS position
+                FROM {table} WHERE {column} IS NOT NULL
+            ) WHERE position = 1
+        )
+    """))
+    return result.rowcount
+
+def _add_missing_columns(conn):
+    """ALTER TABLE ADD COLUMN for model columns an older database lacks"""
+    for table in Base.metadata.sorted_tables:
+        present = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table.name})"))}
+        for column in table.columns:
+            if column.name not in present:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"[MIGRATE] Added column {table.name}.{column.name}")
+
+def run_migrations(bind=engine, release_duplicates: bool = False):
+    with bind.begin() as conn:
+        _add_missing_columns(conn)
+        existing = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index'"
+        )).scalars())
+        blocked = set()
+        for table, column in EXTERNAL_IDS:
+            name = f"ux_{table}_{column}"
+            if name in existing:
+                continue
+            if release_duplicates:
+                released = _release_duplicate_external_ids(conn, table, column)
+                if released:
+                    print(f"[MIGRATE] Cleared duplicate {table}.{column} on {released} older rows")
+            duplicates = _duplicate_external_ids(conn, table, column)
+            if duplicates:
+                blocked.add(name)
+                listed = "; ".join(f"{column} {value}: ids {ids}" for value, ids in list(duplicates.items())[:20])
+                print(
+                    f"[MIGRATE] Not creating {name}, {len(duplicates)} {column} values are shared by several "
+                    f"{table} rows ({listed}). Fix them or run `python -m app.migrations --release-duplicates`; "
+                    f"until then bulk upserts on {column} fail"
+                )
+        created = False
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing and index.name not in blocked:
+                    index.create(bind=conn)
+                    created = True
+                    print(f"[MIGRATE] Created index {index.name}")
+        if created:
+            # Refresh planner statistics so the new indexes get picked
+            conn.execute(text("ANALYZE"))
+
+# Run this to migrate the database in the working directory
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the database in the working directory")
+    parser.add_argument(
+        "--release-duplicates", action="store_true",
+        help="keep each duplicated mal_id/spotify_id on its most recently updated row and clear it elsewhere",
+    )
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    run_migrations(release_duplicates=args.release_duplicates)
+    print("Migrations applied successfully!")
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import synonym
 from datetime import datetime
 
 Base = declarative_base()
@@ -21,6 +22,13 @@ class Anime(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Hot paths: status-filtered lists ordered by updated_at, external ID lookups
+    __table_args__ = (
+        Index("ix_anime_status_updated_at", "status", "updated_at"),
+        Index("ix_anime_updated_at", "updated_at"),
+        Index("ux_anime_mal_id", "mal_id", unique=True),
+    )
+
 class Manga(Base):
     __tablename__ = "manga"
     
@@ -38,6 +46,12 @@ class Manga(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_manga_status_updated_at", "status", "updated_at"),
+        Index("ix_manga_updated_at", "updated_at"),
+        Index("ux_manga_mal_id", "mal_id", unique=True),
+    )
+
 class Game(Base):
     __tablename__ = "games"
     
@@ -51,6 +65,11 @@ class Game(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_games_status_updated_at", "status", "updated_at"),
+        Index("ix_games_updated_at", "updated_at"),
+    )
+
 class Music(Base):
     __tablename__ = "music"
 
@@ -63,6 +82,133 @@ class Music(Base):
     favorite = Column(Boolean, default=False)
     notes = Column(Text)
     image_url = Column(String)
+    rating = Column(Float, nullable=True)
     spotify_id = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # The API calls the artwork cover_url, like Game
+    cover_url = synonym("image_url")
+
+    __table_args__ = (
+        Index("ix_music_status_updated_at", "status", "updated_at"),
+        Index("ix_music_updated_at", "updated_at"),
+        Index("ux_music_spotify_id", "spotify_id", unique=True),
+    )
+
+class MediaCounter(Base):
+    __tablename__ = "media_counters"
+
+    # One row per (media table, status); maintained by triggers in counters.py
+    media = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+    favorite_count = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Float, nullable=False, default=0)
+    volume_total = Column(Integer, nullable=False, default=0)
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    # Bumped by triggers in counters.py on every write to a media table;
+    # changed_at is epoch seconds. Backs the ETags of the library endpoints.
+    media = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    changed_at = Column(Float, nullable=False)
+
+class ResponseCacheEntry(Base):
+    __tablename__ = "response_cache"
+
+    # Persistent tier of cache.ResponseCache; timestamps are epoch seconds
+    key = Column(String, primary_key=True)
+    data = Column(Text, nullable=False)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    fresh_until = Column(Float, nullable=False)
+    stale_until = Column(Float, nullable=False)
+    stored_at = Column(Float, nullable=False)
+
+class ImageSource(Base):
+    __tablename__ = "image_sources"
+
+    # Which cached blob (sha256 of its bytes) a remote image URL resolved to
+    url = Column(String, primary_key=True)
+    digest = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    fetched_at = Column(Float, nullable=False)
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    # One MyAnimeList list import; next_offset is where a resumed job picks up
+    id = Column(Integer, primary_key=True, index=True)
+    username = Column(String, nullable=False)
+    media = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="running")
+    next_offset = Column(Integer, nullable=False, default=0)
+    pages = Column(Integer, nullable=False, default=0)
+    imported = Column(Integer, nullable=False, default=0)
+    created = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+# Local mirror of each user's Spotify library, kept by spotify_sync.py.
+# ``data`` holds the item exactly as the /spotify routes shape it, as JSON.
+class SpotifyPlaylist(Base):
+    __tablename__ = "spotify_playlists"
+
+    user_id = Column(String, primary_key=True)
+    playlist_id = Column(String, primary_key=True)
+    position = Column(Integer, nullable=False)
+    snapshot_id = Column(String, nullable=True)
+    # Snapshot the mirrored tracks were taken from; differs while they are stale
+    tracks_snapshot_id = Column(String, nullable=True)
+    data = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_spotify_playlists_user_position", "user_id", "position"),
+    )
+
+class SpotifyPlaylistTrack(Base):
+    __tablename__ = "spotify_playlist_tracks"
+
+    playlist_id = Column(String, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    data = Column(Text, nullable=False)
+
+class SpotifySavedItem(Base):
+    __tablename__ = "spotify_saved_items"
+
+    user_id = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)  # album | track
+    item_id = Column(String, primary_key=True)
+    added_at = Column(String, nullable=False)
+    data = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_spotify_saved_items_user_kind_added_at", "user_id", "kind", "added_at"),
+    )
+
+class SpotifyFollowedArtist(Base):
+    __tablename__ = "spotify_followed_artists"
+
+    user_id = Column(String, primary_key=True)
+    artist_id = Column(String, primary_key=True)
+    position = Column(Integer, nullable=False)
+    data = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_spotify_followed_artists_user_position", "user_id", "position"),
+    )
+
+class SpotifySyncState(Base):
+    __tablename__ = "spotify_sync_state"
+
+    # Last successful sync of one mirrored resource; synced_at is epoch seconds
+    user_id = Column(String, primary_key=True)
+    resource = Column(String, primary_key=True)
+    synced_at = Column(Float, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,35 @@
+"""Opaque keyset cursors for the media list endpoints.
+
+Lists are ordered by ``(updated_at, id)`` descending. A cursor encodes the
+sort key of the last row on a page, and the next page starts strictly after
+it, so page N costs the same as page 1 and concurrent edits never shift rows
+between pages. The cursor for the next page comes back in X-Next-Cursor.
+"""
+import base64
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(updated_at: datetime, row_id: int) -> str:
+    raw = f"{updated_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Sort key encoded in ``cursor``; raises a 400 for anything malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        updated_at, row_id = raw.split("|")
+        return datetime.fromisoformat(updated_at), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int):
+    """Advertise the cursor for the following page when this one is full"""
+    if limit > 0 and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.updated_at, last.id)
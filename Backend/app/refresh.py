@@ -0,0 +1,143 @@
+"""Periodic refresh of airing metadata for titles in progress.
+
+Episode and chapter totals change while a show airs or a series runs, so
+every REFRESH_INTERVAL (give or take REFRESH_JITTER) the anime being watched
+and the manga being read are re-checked against Jikan. Only those rows are
+read, through the status index, so a pass costs O(in-progress titles) however
+large the library is. Details come through the response cache at background
+priority, and each batch writes only the columns that changed, in one
+transaction, without touching ``updated_at``.
+"""
+import asyncio
+import random
+from typing import Dict, FrozenSet, List, Optional
+
+from sqlalchemy import bindparam, select, update
+
+from . import cache, config, models
+from .cache import ResponseCache
+from .database import AsyncReadSessionLocal, AsyncSessionLocal
+from .jikan import BACKGROUND, JikanScheduler
+
+# media -> (model, in-progress status, {column: Jikan detail field})
+REFRESHED = {
+    "anime": (models.Anime, "watching", {"episodes": "episodes"}),
+    "manga": (models.Manga, "reading", {"total_chapters": "chapters", "total_volumes": "volumes"}),
+}
+
+class AiringRefresher:
+    def __init__(
+        self,
+        jikan: JikanScheduler,
+        response_cache: ResponseCache,
+        interval: float = config.REFRESH_INTERVAL,
+        jitter: float = config.REFRESH_JITTER,
+        initial_delay: float = config.REFRESH_INITIAL_DELAY,
+        batch_size: int = config.REFRESH_BATCH_SIZE,
+        session_factory=AsyncSessionLocal,
+        read_session_factory=AsyncReadSessionLocal,
+    ):
+        self.jikan = jikan
+        self.response_cache = response_cache
+        self.interval = interval
+        self.jitter = jitter
+        self.initial_delay = initial_delay
+        self.batch_size = batch_size
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    def _delay(self, base: float) -> float:
+        return max(0.0, base * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def _loop(self):
+        await asyncio.sleep(self._delay(self.initial_delay))
+        while True:
+            try:
+                changed = await self.run_once()
+                print(f"[REFRESH] Updated {changed} in-progress titles")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[REFRESH] Pass failed: {e}")
+            await asyncio.sleep(self._delay(self.interval))
+
+    async def run_once(self) -> int:
+        """Refresh every in-progress title once; returns how many rows changed"""
+        changed = 0
+        for media in REFRESHED:
+            changed += await self._refresh(media)
+        return changed
+
+    async def _refresh(self, media: str) -> int:
+        model, status, fields = REFRESHED[media]
+        columns = [getattr(model, column) for column in fields]
+        changed, after = 0, 0
+        while True:
+            async with self._read_session_factory() as db:
+                rows = (await db.execute(
+                    select(model.id, model.mal_id, *columns)
+                    .where(model.status == status, model.mal_id.is_not(None), model.id > after)
+                    .order_by(model.id)
+                    .limit(self.batch_size)
+                )).all()
+            if not rows:
+                return changed
+            after = rows[-1].id
+            details = await asyncio.gather(*(self._details(media, row.mal_id) for row in rows))
+            changes = []
+            for row, data in zip(rows, details):
+                if data is None:
+                    continue
+                # Jikan leaves totals empty while unknown; never erase a known one
+                values = {
+                    column: data[field] for column, field in fields.items()
+                    if data.get(field) is not None and data[field] != getattr(row, column)
+                }
+                if values:
+                    changes.append((row.id, values))
+            if changes:
+                await self._write(model, changes)
+                changed += len(changes)
+
+    async def _details(self, media: str, mal_id: int) -> Optional[dict]:
+        try:
+            response = await self.response_cache.get(
+                self.jikan, f"/{media}/{mal_id}", policy=cache.DETAILS, priority=BACKGROUND,
+            )
+        except Exception as e:
+            print(f"[REFRESH] Fetching {media} {mal_id} failed: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json()["data"]
+
+    async def _write(self, model, changes: List[tuple]):
+        """One transaction per batch, with one executemany UPDATE per set of changed columns"""
+        table = model.__table__
+        groups: Dict[FrozenSet[str], List[dict]] = {}
+        for row_id, values in changes:
+            groups.setdefault(frozenset(values), []).append(
+                {"match_id": row_id, **{f"new_{column}": value for column, value in values.items()}}
+            )
+        async with self._session_factory() as db:
+            for group, params in groups.items():
+                stmt = (
+                    update(table)
+                    .where(table.c.id == bindparam("match_id"))
+                    # Keep updated_at, so a refresh doesn't reorder the lists
+                    .values({
+                        **{column: bindparam(f"new_{column}") for column in group},
+                        "updated_at": table.c.updated_at,
+                    })
+                )
+                await db.execute(stmt, params)
+            await db.commit()
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,75 @@
+"""Fast JSON responses for large payloads.
+
+Rows read straight from the library tables are already trusted, so the list
+endpoints select plain column tuples instead of ORM objects, skip per-row
+Pydantic validation and encode with orjson. Without orjson installed,
+pydantic-core's Rust encoder is used instead; both emit the same ISO 8601
+datetimes as the validated path.
+
+The upstream proxies build their payloads as plain dicts, so their routers
+use ``FastJSONRoute`` to skip ``jsonable_encoder``, which costs far more than
+the encoding itself on large lists.
+"""
+import functools
+import inspect
+from typing import Any, Optional, Sequence
+
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+    from pydantic_core import to_json
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return to_json(content)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse that trusts its content and encodes it in one native pass"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def _pick(row, fields: Optional[Sequence[str]]) -> dict:
+    if fields is None:
+        return row._asdict()
+    return {name: getattr(row, name) for name in fields}
+
+def rows_response(rows: Sequence, fields: Optional[Sequence[str]] = None, **kwargs) -> FastJSONResponse:
+    """Serialize rows selected through a ``fields.FieldSet`` without revalidating them"""
+    return FastJSONResponse([_pick(row, fields) for row in rows], **kwargs)
+
+def row_response(row, fields: Optional[Sequence[str]] = None, **kwargs) -> FastJSONResponse:
+    return FastJSONResponse(_pick(row, fields), **kwargs)
+
+class FastJSONRoute(APIRoute):
+    """Route that sends a handler's plain dict/list result straight to FastJSONResponse
+
+    Routes with a response_model keep FastAPI's validated path.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if isinstance(kwargs.get("response_model"), DefaultPlaceholder):
+            endpoint = _encode_directly(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+def _encode_directly(endpoint):
+    def respond(result):
+        return result if isinstance(result, Response) else FastJSONResponse(result)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            return respond(await endpoint(*args, **kwargs))
+    else:
+        # Plain handlers still run in the threadpool
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            return respond(endpoint(*args, **kwargs))
+    return wrapper
@@ -1,64 +1,115 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from .. import models, schemas
-from ..database import get_db
+from .. import config, crud, models, schemas
+from ..conditional import Validators, library_validators
+from ..database import get_read_db, get_write_db
+from ..enrichment import Enricher, get_enricher, needs_enrichment
+from ..fields import FieldSet
+from ..pagination import decode_cursor, set_next_cursor
+from ..responses import row_response, rows_response
 
 router = APIRouter(prefix="/anime", tags=["anime"])
 
+# ?fields= for the list and detail endpoints; ``card`` is what the grid view shows
+FIELDS = FieldSet(
+    models.Anime, schemas.AnimeResponse,
+    card=("id", "title", "image_url", "status", "current_episode", "episodes", "user_score"),
+)
+
 @router.get("", response_model=List[schemas.AnimeResponse])
-def get_anime_list(
+async def get_anime_list(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    validators: Validators = Depends(library_validators("anime")),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(models.Anime)
-    
-    if status:
-        query = query.filter(models.Anime.status == status)
-    
-    anime = query.order_by(models.Anime.updated_at.desc()).offset(skip).limit(limit).all()
-    return anime
+    """Newest first. Pass the X-Next-Cursor header back as ``cursor`` for the next page."""
+    names = FIELDS.resolve(fields)
+    anime = await crud.get_all_anime(db, skip=skip, limit=limit, status=status, after=decode_cursor(cursor), columns=FIELDS.columns(names))
+    response = rows_response(anime, fields=names, headers=validators.headers)
+    set_next_cursor(response, anime, limit)
+    return response
 
 @router.get("/{anime_id}", response_model=schemas.AnimeResponse)
-def get_anime(anime_id: int, db: Session = Depends(get_db)):
-    anime = db.query(models.Anime).filter(models.Anime.id == anime_id).first()
+async def get_anime(anime_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    names = FIELDS.resolve(fields)
+    anime = await crud.get_anime(db, anime_id, columns=FIELDS.columns(names))
     if not anime:
         raise HTTPException(status_code=404, detail="Anime not found")
-    return anime
+    return row_response(anime, fields=names)
 
 @router.post("", response_model=schemas.AnimeResponse)
-def create_anime(anime: schemas.AnimeCreate, db: Session = Depends(get_db)):
-    db_anime = models.Anime(**anime.dict())
-    db.add(db_anime)
-    db.commit()
-    db.refresh(db_anime)
+async def create_anime(
+    anime: schemas.AnimeCreate,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    """Missing details of a title with a mal_id are filled in from MyAnimeList shortly after"""
+    db_anime = await crud.create_anime(db, anime)
+    if needs_enrichment("anime", db_anime):
+        enricher.enqueue("anime", db_anime.mal_id)
     return db_anime
 
+@router.post("/bulk", response_model=schemas.BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_anime(
+    items: List[schemas.AnimeCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Create or update many anime in one transaction, matching existing rows on mal_id"""
+    return await crud.bulk_upsert_anime(db, items)
+
+@router.patch("/batch", response_model=schemas.BatchPatchResult, response_model_exclude_none=True)
+async def batch_update_anime(
+    response: Response,
+    items: List[schemas.BatchPatchItem] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    atomic: bool = True,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    """Apply many ``{id, changes}`` partial updates in one transaction, with an outcome per item
+
+    By default nothing is written unless every item applies (409 otherwise);
+    ``atomic=false`` commits the items that do.
+    """
+    result = await crud.batch_update(db, models.Anime, schemas.AnimeUpdate, items, atomic)
+    if not result["committed"]:
+        response.status_code = 409
+    else:
+        for item, outcome in zip(items, result["results"]):
+            if outcome["status"] == "updated" and item.changes.get("mal_id") is not None:
+                enricher.enqueue("anime", int(item.changes["mal_id"]))
+    return result
+
 @router.put("/{anime_id}", response_model=schemas.AnimeResponse)
-def update_anime(anime_id: int, anime: schemas.AnimeUpdate, db: Session = Depends(get_db)):
-    db_anime = db.query(models.Anime).filter(models.Anime.id == anime_id).first()
+async def update_anime(
+    anime_id: int,
+    anime: schemas.AnimeUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    db_anime = await crud.update_anime(db, anime_id, anime)
     if not db_anime:
         raise HTTPException(status_code=404, detail="Anime not found")
-    
-    for key, value in anime.dict(exclude_unset=True).items():
-        setattr(db_anime, key, value)
-    
-    db.commit()
-    db.refresh(db_anime)
+    if "mal_id" in anime.model_fields_set and needs_enrichment("anime", db_anime):
+        enricher.enqueue("anime", db_anime.mal_id)
     return db_anime
 
 @router.patch("/{anime_id}", response_model=schemas.AnimeResponse)
-def partial_update_anime(anime_id: int, anime: schemas.AnimeUpdate, db: Session = Depends(get_db)):
-    return update_anime(anime_id, anime, db)
+async def partial_update_anime(
+    anime_id: int,
+    anime: schemas.AnimeUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    return await update_anime(anime_id, anime, db, enricher)
 
 @router.delete("/{anime_id}")
-def delete_anime(anime_id: int, db: Session = Depends(get_db)):
-    db_anime = db.query(models.Anime).filter(models.Anime.id == anime_id).first()
+async def delete_anime(anime_id: int, db: AsyncSession = Depends(get_write_db)):
+    db_anime = await crud.delete_anime(db, anime_id)
     if not db_anime:
         raise HTTPException(status_code=404, detail="Anime not found")
-    
-    db.delete(db_anime)
-    db.commit()
     return {"message": "Anime deleted successfully"}
@@ -1,64 +1,89 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from .. import models, schemas
-from ..database import get_db
+from .. import config, crud, models, schemas
+from ..conditional import Validators, library_validators
+from ..database import get_read_db, get_write_db
+from ..fields import FieldSet
+from ..pagination import decode_cursor, set_next_cursor
+from ..responses import row_response, rows_response
 
 router = APIRouter(prefix="/games", tags=["games"])
 
+# ?fields= for the list and detail endpoints; ``card`` is what the grid view shows
+FIELDS = FieldSet(
+    models.Game, schemas.GameResponse,
+    card=("id", "title", "cover_url", "status", "playtime_hours", "user_score"),
+)
+
 @router.get("", response_model=List[schemas.GameResponse])
-def get_games_list(
+async def get_games_list(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    validators: Validators = Depends(library_validators("games")),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(models.Game)
-    
-    if status:
-        query = query.filter(models.Game.status == status)
-    
-    games = query.order_by(models.Game.updated_at.desc()).offset(skip).limit(limit).all()
-    return games
+    """Newest first. Pass the X-Next-Cursor header back as ``cursor`` for the next page."""
+    names = FIELDS.resolve(fields)
+    games = await crud.get_all_games(db, skip=skip, limit=limit, status=status, after=decode_cursor(cursor), columns=FIELDS.columns(names))
+    response = rows_response(games, fields=names, headers=validators.headers)
+    set_next_cursor(response, games, limit)
+    return response
 
 @router.get("/{game_id}", response_model=schemas.GameResponse)
-def get_game(game_id: int, db: Session = Depends(get_db)):
-    game = db.query(models.Game).filter(models.Game.id == game_id).first()
+async def get_game(game_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    names = FIELDS.resolve(fields)
+    game = await crud.get_game(db, game_id, columns=FIELDS.columns(names))
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
-    return game
+    return row_response(game, fields=names)
 
 @router.post("", response_model=schemas.GameResponse)
-def create_game(game: schemas.GameCreate, db: Session = Depends(get_db)):
-    db_game = models.Game(**game.dict())
-    db.add(db_game)
-    db.commit()
-    db.refresh(db_game)
-    return db_game
+async def create_game(game: schemas.GameCreate, db: AsyncSession = Depends(get_write_db)):
+    return await crud.create_game(db, game)
+
+@router.post("/bulk", response_model=schemas.BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_games(
+    items: List[schemas.GameCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Create many games in one transaction"""
+    return await crud.bulk_upsert_games(db, items)
+
+@router.patch("/batch", response_model=schemas.BatchPatchResult, response_model_exclude_none=True)
+async def batch_update_games(
+    response: Response,
+    items: List[schemas.BatchPatchItem] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    atomic: bool = True,
+    db: AsyncSession = Depends(get_write_db),
+):
+    """Apply many ``{id, changes}`` partial updates in one transaction, with an outcome per item
+
+    By default nothing is written unless every item applies (409 otherwise);
+    ``atomic=false`` commits the items that do.
+    """
+    result = await crud.batch_update(db, models.Game, schemas.GameUpdate, items, atomic)
+    if not result["committed"]:
+        response.status_code = 409
+    return result
 
 @router.put("/{game_id}", response_model=schemas.GameResponse)
-def update_game(game_id: int, game: schemas.GameUpdate, db: Session = Depends(get_db)):
-    db_game = db.query(models.Game).filter(models.Game.id == game_id).first()
+async def update_game(game_id: int, game: schemas.GameUpdate, db: AsyncSession = Depends(get_write_db)):
+    db_game = await crud.update_game(db, game_id, game)
     if not db_game:
         raise HTTPException(status_code=404, detail="Game not found")
-    
-    for key, value in game.dict(exclude_unset=True).items():
-        setattr(db_game, key, value)
-    
-    db.commit()
-    db.refresh(db_game)
     return db_game
 
 @router.patch("/{game_id}", response_model=schemas.GameResponse)
-def partial_update_game(game_id: int, game: schemas.GameUpdate, db: Session = Depends(get_db)):
-    return update_game(game_id, game, db)
+async def partial_update_game(game_id: int, game: schemas.GameUpdate, db: AsyncSession = Depends(get_write_db)):
+    return await update_game(game_id, game, db)
 
 @router.delete("/{game_id}")
-def delete_game(game_id: int, db: Session = Depends(get_db)):
-    db_game = db.query(models.Game).filter(models.Game.id == game_id).first()
+async def delete_game(game_id: int, db: AsyncSession = Depends(get_write_db)):
+    db_game = await crud.delete_game(db, game_id)
     if not db_game:
         raise HTTPException(status_code=404, detail="Game not found")
-    
-    db.delete(db_game)
-    db.commit()
     return {"message": "Game deleted successfully"}
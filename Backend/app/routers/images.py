@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+from typing import Optional
+from urllib.parse import urlsplit
+from .. import config
+from ..images import FORMATS, ImageCache, ImageError, get_image_cache, snap_width
+
+router = APIRouter(prefix="/images", tags=["images"])
+
+# Cached files never change under their URL
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+@router.get("")
+async def get_image(
+    request: Request,
+    url: str,
+    w: Optional[int] = Query(None, ge=1, description="Thumbnail width, rounded up to a configured size"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$"),
+    images: ImageCache = Depends(get_image_cache),
+):
+    """Proxy cover art through the local cache, e.g. ``/images?url=<image_url>&w=240``
+
+    Without ``format`` the thumbnail is WebP for clients that accept it, JPEG otherwise.
+    """
+    if urlsplit(url).scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail="url must be an http(s) URL")
+
+    headers = {"Cache-Control": IMMUTABLE}
+    width = snap_width(w) if w else None
+    if width and format is None:
+        format = "webp" if FORMATS["webp"] in request.headers.get("accept", "") else "jpeg"
+        headers["Vary"] = "Accept"
+
+    try:
+        image = await images.get(url, width, format)
+    except ImageError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+
+    headers["ETag"] = image.etag
+    if image.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(image.path, media_type=image.media_type, headers=headers)
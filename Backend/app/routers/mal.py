@@ -1,132 +1,210 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 import httpx
 from typing import List, Optional
+from .. import cache, config, models, schemas
+from ..cache import ResponseCache, get_response_cache
+from ..database import get_read_db, get_write_db
+from ..jikan import JikanRateLimited, JikanScheduler, get_jikan, rate_limited
+from ..mal_import import IMPORTERS, MALImporter, get_mal_importer
+from ..responses import FastJSONRoute
 
-router = APIRouter(prefix="/mal", tags=["myanimelist"])
+router = APIRouter(prefix="/mal", tags=["myanimelist"], route_class=FastJSONRoute)
 
-MAL_API_BASE = "https://api.myanimelist.net/v2"
-# Note: For production, you should use environment variables for the client ID
-MAL_CLIENT_ID = "your_mal_client_id_here"  # You'll need to get this from MAL
-
-# For now, we'll use Jikan API which doesn't require authentication
-JIKAN_API_BASE = "https://api.jikan.moe/v4"
+# Searches and details use Jikan, which doesn't require authentication.
+# User list imports need the official API; set MAL_CLIENT_ID for those.
+# Requests go through the Jikan scheduler, which rate-limits and coalesces them.
 
 @router.get("/anime/search")
-async def search_anime(q: str, limit: int = 10):
+async def search_anime(
+    q: str,
+    limit: int = 10,
+    jikan: JikanScheduler = Depends(get_jikan),
+    response_cache: ResponseCache = Depends(get_response_cache),
+):
     """Search for anime on MyAnimeList"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{JIKAN_API_BASE}/anime",
-                params={"q": q, "limit": limit}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "results": [
-                        {
-                            "mal_id": anime["mal_id"],
-                            "title": anime["title"],
-                            "title_english": anime.get("title_english"),
-                            "title_japanese": anime.get("title_japanese"),
-                            "synopsis": anime.get("synopsis"),
-                            "image_url": anime["images"]["jpg"]["large_image_url"],
-                            "episodes": anime.get("episodes"),
-                            "score": anime.get("score"),
-                            "genres": [g["name"] for g in anime.get("genres", [])],
-                        }
-                        for anime in data.get("data", [])
-                    ]
-                }
-            return {"results": []}
+        response = await response_cache.get(
+            jikan,
+            "/anime",
+            params={"q": q, "limit": limit},
+            policy=cache.SEARCH,
+        )
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "results": [
+                    {
+                        "mal_id": anime["mal_id"],
+                        "title": anime["title"],
+                        "title_english": anime.get("title_english"),
+                        "title_japanese": anime.get("title_japanese"),
+                        "synopsis": anime.get("synopsis"),
+                        "image_url": anime["images"]["jpg"]["large_image_url"],
+                        "episodes": anime.get("episodes"),
+                        "score": anime.get("score"),
+                        "genres": [g["name"] for g in anime.get("genres", [])],
+                    }
+                    for anime in data.get("data", [])
+                ]
+            }
+        return {"results": []}
+    except JikanRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching anime: {str(e)}")
 
 @router.get("/anime/{mal_id}")
-async def get_anime_details(mal_id: int):
+async def get_anime_details(
+    mal_id: int,
+    jikan: JikanScheduler = Depends(get_jikan),
+    response_cache: ResponseCache = Depends(get_response_cache),
+):
     """Get detailed anime information from MyAnimeList"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{JIKAN_API_BASE}/anime/{mal_id}")
-            if response.status_code == 200:
-                data = response.json()
-                anime = data["data"]
-                return {
-                    "mal_id": anime["mal_id"],
-                    "title": anime["title"],
-                    "title_english": anime.get("title_english"),
-                    "title_japanese": anime.get("title_japanese"),
-                    "synopsis": anime.get("synopsis"),
-                    "image_url": anime["images"]["jpg"]["large_image_url"],
-                    "episodes": anime.get("episodes"),
-                    "score": anime.get("score"),
-                    "genres": [g["name"] for g in anime.get("genres", [])],
-                    "status": anime.get("status"),
-                    "aired": anime.get("aired", {}).get("string"),
-                }
-            raise HTTPException(status_code=404, detail="Anime not found")
+        response = await response_cache.get(jikan, f"/anime/{mal_id}", policy=cache.DETAILS)
+        if response.status_code == 200:
+            data = response.json()
+            anime = data["data"]
+            return {
+                "mal_id": anime["mal_id"],
+                "title": anime["title"],
+                "title_english": anime.get("title_english"),
+                "title_japanese": anime.get("title_japanese"),
+                "synopsis": anime.get("synopsis"),
+                "image_url": anime["images"]["jpg"]["large_image_url"],
+                "episodes": anime.get("episodes"),
+                "score": anime.get("score"),
+                "genres": [g["name"] for g in anime.get("genres", [])],
+                "status": anime.get("status"),
+                "aired": anime.get("aired", {}).get("string"),
+            }
+        raise HTTPException(status_code=404, detail="Anime not found")
     except httpx.HTTPStatusError:
         raise HTTPException(status_code=404, detail="Anime not found")
+    except JikanRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching anime: {str(e)}")
 
 @router.get("/manga/search")
-async def search_manga(q: str, limit: int = 10):
+async def search_manga(
+    q: str,
+    limit: int = 10,
+    jikan: JikanScheduler = Depends(get_jikan),
+    response_cache: ResponseCache = Depends(get_response_cache),
+):
     """Search for manga on MyAnimeList"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{JIKAN_API_BASE}/manga",
-                params={"q": q, "limit": limit}
-            )
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "results": [
-                        {
-                            "mal_id": manga["mal_id"],
-                            "title": manga["title"],
-                            "title_english": manga.get("title_english"),
-                            "title_japanese": manga.get("title_japanese"),
-                            "synopsis": manga.get("synopsis"),
-                            "image_url": manga["images"]["jpg"]["large_image_url"],
-                            "chapters": manga.get("chapters"),
-                            "volumes": manga.get("volumes"),
-                            "score": manga.get("score"),
-                            "genres": [g["name"] for g in manga.get("genres", [])],
-                        }
-                        for manga in data.get("data", [])
-                    ]
-                }
-            return {"results": []}
+        response = await response_cache.get(
+            jikan,
+            "/manga",
+            params={"q": q, "limit": limit},
+            policy=cache.SEARCH,
+        )
+        if response.status_code == 200:
+            data = response.json()
+            return {
+                "results": [
+                    {
+                        "mal_id": manga["mal_id"],
+                        "title": manga["title"],
+                        "title_english": manga.get("title_english"),
+                        "title_japanese": manga.get("title_japanese"),
+                        "synopsis": manga.get("synopsis"),
+                        "image_url": manga["images"]["jpg"]["large_image_url"],
+                        "chapters": manga.get("chapters"),
+                        "volumes": manga.get("volumes"),
+                        "score": manga.get("score"),
+                        "genres": [g["name"] for g in manga.get("genres", [])],
+                    }
+                    for manga in data.get("data", [])
+                ]
+            }
+        return {"results": []}
+    except JikanRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching manga: {str(e)}")
 
 @router.get("/manga/{mal_id}")
-async def get_manga_details(mal_id: int):
+async def get_manga_details(
+    mal_id: int,
+    jikan: JikanScheduler = Depends(get_jikan),
+    response_cache: ResponseCache = Depends(get_response_cache),
+):
     """Get detailed manga information from MyAnimeList"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{JIKAN_API_BASE}/manga/{mal_id}")
-            if response.status_code == 200:
-                data = response.json()
-                manga = data["data"]
-                return {
-                    "mal_id": manga["mal_id"],
-                    "title": manga["title"],
-                    "title_english": manga.get("title_english"),
-                    "title_japanese": manga.get("title_japanese"),
-                    "synopsis": manga.get("synopsis"),
-                    "image_url": manga["images"]["jpg"]["large_image_url"],
-                    "chapters": manga.get("chapters"),
-                    "volumes": manga.get("volumes"),
-                    "score": manga.get("score"),
-                    "genres": [g["name"] for g in manga.get("genres", [])],
-                    "status": manga.get("status"),
-                    "published": manga.get("published", {}).get("string"),
-                }
-            raise HTTPException(status_code=404, detail="Manga not found")
+        response = await response_cache.get(jikan, f"/manga/{mal_id}", policy=cache.DETAILS)
+        if response.status_code == 200:
+            data = response.json()
+            manga = data["data"]
+            return {
+                "mal_id": manga["mal_id"],
+                "title": manga["title"],
+                "title_english": manga.get("title_english"),
+                "title_japanese": manga.get("title_japanese"),
+                "synopsis": manga.get("synopsis"),
+                "image_url": manga["images"]["jpg"]["large_image_url"],
+                "chapters": manga.get("chapters"),
+                "volumes": manga.get("volumes"),
+                "score": manga.get("score"),
+                "genres": [g["name"] for g in manga.get("genres", [])],
+                "status": manga.get("status"),
+                "published": manga.get("published", {}).get("string"),
+            }
+        raise HTTPException(status_code=404, detail="Manga not found")
     except httpx.HTTPStatusError:
         raise HTTPException(status_code=404, detail="Manga not found")
+    except JikanRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching manga: {str(e)}")
+
+@router.post("/import", response_model=schemas.ImportJobResponse, status_code=202)
+async def start_import(
+    job: schemas.ImportJobCreate,
+    db: AsyncSession = Depends(get_write_db),
+    importer: MALImporter = Depends(get_mal_importer),
+):
+    """Import a MyAnimeList user's anime or manga list in the background
+
+    Entries are matched on mal_id, so re-importing updates the existing rows.
+    Poll ``GET /mal/import/{job_id}`` for progress.
+    """
+    if job.media not in IMPORTERS:
+        raise HTTPException(status_code=400, detail=f"Unknown media type: {job.media}")
+    if not config.MAL_CLIENT_ID:
+        raise HTTPException(status_code=503, detail="List imports need MAL_CLIENT_ID to be configured")
+    db_job = models.ImportJob(username=job.username, media=job.media, status="running")
+    db.add(db_job)
+    await db.commit()
+    await db.refresh(db_job)
+    importer.start(db_job.id)
+    return db_job
+
+@router.get("/import/{job_id}", response_model=schemas.ImportJobResponse)
+async def get_import(job_id: int, db: AsyncSession = Depends(get_read_db)):
+    db_job = await db.get(models.ImportJob, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return db_job
+
+@router.post("/import/{job_id}/resume", response_model=schemas.ImportJobResponse, status_code=202)
+async def resume_import(
+    job_id: int,
+    db: AsyncSession = Depends(get_write_db),
+    importer: MALImporter = Depends(get_mal_importer),
+):
+    """Continue a failed or interrupted import from the first page it did not write"""
+    db_job = await db.get(models.ImportJob, job_id)
+    if db_job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if db_job.status == "completed" or importer.is_running(job_id):
+        raise HTTPException(status_code=409, detail=f"Import job is already {db_job.status}")
+    db_job.status = "running"
+    db_job.error = None
+    await db.commit()
+    await db.refresh(db_job)
+    importer.start(db_job.id)
+    return db_job
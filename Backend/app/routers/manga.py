@@ -1,65 +1,111 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from ..database import get_db
-from .. import models, schemas
+from ..conditional import Validators, library_validators
+from ..database import get_read_db, get_write_db
+from ..enrichment import Enricher, get_enricher, needs_enrichment
+from ..fields import FieldSet
+from ..pagination import decode_cursor, set_next_cursor
+from ..responses import row_response, rows_response
+from .. import config, crud, models, schemas
 
 router = APIRouter(prefix="/manga", tags=["manga"])
 
+# ?fields= for the list and detail endpoints; ``card`` is what the grid view shows
+FIELDS = FieldSet(
+    models.Manga, schemas.MangaResponse,
+    card=("id", "title", "image_url", "status", "current_chapter", "total_chapters", "current_volume", "total_volumes", "rating"),
+)
+
 @router.get("", response_model=List[schemas.MangaResponse])
-def get_manga_list(
+async def get_manga_list(
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     genre: Optional[str] = None,
-    db: Session = Depends(get_db)
+    fields: Optional[str] = None,
+    validators: Validators = Depends(library_validators("manga")),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(models.Manga)
-    
-    if status and status != "all":
-        query = query.filter(models.Manga.status == status)
-    
+    """Newest first. Pass the X-Next-Cursor header back as ``cursor`` for the next page."""
     # Note: Genre filtering would require a many-to-many relationship
     # For now, we'll skip genre filtering or implement it differently
     
-    manga = query.order_by(models.Manga.updated_at.desc()).offset(skip).limit(limit).all()
-    return manga
+    names = FIELDS.resolve(fields)
+    manga = await crud.get_all_manga(db, skip=skip, limit=limit, status=status, after=decode_cursor(cursor), columns=FIELDS.columns(names))
+    response = rows_response(manga, fields=names, headers=validators.headers)
+    set_next_cursor(response, manga, limit)
+    return response
 
 @router.post("", response_model=schemas.MangaResponse)
-def create_manga(manga: schemas.MangaCreate, db: Session = Depends(get_db)):
-    db_manga = models.Manga(**manga.dict())
-    db.add(db_manga)
-    db.commit()
-    db.refresh(db_manga)
+async def create_manga(
+    manga: schemas.MangaCreate,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    """Missing details of a title with a mal_id are filled in from MyAnimeList shortly after"""
+    db_manga = await crud.create_manga(db, manga)
+    if needs_enrichment("manga", db_manga):
+        enricher.enqueue("manga", db_manga.mal_id)
     return db_manga
 
+@router.post("/bulk", response_model=schemas.BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_manga(
+    items: List[schemas.MangaCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Create or update many manga in one transaction, matching existing rows on mal_id"""
+    return await crud.bulk_upsert_manga(db, items)
+
+@router.patch("/batch", response_model=schemas.BatchPatchResult, response_model_exclude_none=True)
+async def batch_update_manga(
+    response: Response,
+    items: List[schemas.BatchPatchItem] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    atomic: bool = True,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    """Apply many ``{id, changes}`` partial updates in one transaction, with an outcome per item
+
+    By default nothing is written unless every item applies (409 otherwise);
+    ``atomic=false`` commits the items that do.
+    """
+    result = await crud.batch_update(db, models.Manga, schemas.MangaUpdate, items, atomic)
+    if not result["committed"]:
+        response.status_code = 409
+    else:
+        for item, outcome in zip(items, result["results"]):
+            if outcome["status"] == "updated" and item.changes.get("mal_id") is not None:
+                enricher.enqueue("manga", int(item.changes["mal_id"]))
+    return result
+
 @router.get("/{manga_id}", response_model=schemas.MangaResponse)
-def get_manga(manga_id: int, db: Session = Depends(get_db)):
-    manga = db.query(models.Manga).filter(models.Manga.id == manga_id).first()
+async def get_manga(manga_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    names = FIELDS.resolve(fields)
+    manga = await crud.get_manga(db, manga_id, columns=FIELDS.columns(names))
     if not manga:
         raise HTTPException(status_code=404, detail="Manga not found")
-    return manga
+    return row_response(manga, fields=names)
 
 @router.put("/{manga_id}", response_model=schemas.MangaResponse)
-def update_manga(manga_id: int, manga: schemas.MangaUpdate, db: Session = Depends(get_db)):
-    db_manga = db.query(models.Manga).filter(models.Manga.id == manga_id).first()
+async def update_manga(
+    manga_id: int,
+    manga: schemas.MangaUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    enricher: Enricher = Depends(get_enricher),
+):
+    db_manga = await crud.update_manga(db, manga_id, manga)
     if not db_manga:
         raise HTTPException(status_code=404, detail="Manga not found")
-    
-    for key, value in manga.dict().items():
-        setattr(db_manga, key, value)
-    
-    db.commit()
-    db.refresh(db_manga)
+    if "mal_id" in manga.model_fields_set and needs_enrichment("manga", db_manga):
+        enricher.enqueue("manga", db_manga.mal_id)
     return db_manga
 
 @router.delete("/{manga_id}")
-def delete_manga(manga_id: int, db: Session = Depends(get_db)):
-    manga = db.query(models.Manga).filter(models.Manga.id == manga_id).first()
+async def delete_manga(manga_id: int, db: AsyncSession = Depends(get_write_db)):
+    manga = await crud.delete_manga(db, manga_id)
     if not manga:
         raise HTTPException(status_code=404, detail="Manga not found")
-    
-    db.delete(manga)
-    db.commit()
-    return {"message": "Manga deleted successfully"}
\ No newline at end of file
+    return {"message": "Manga deleted successfully"}
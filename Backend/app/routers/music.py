@@ -1,60 +1,85 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from .. import models, schemas
-from ..database import get_db
+from .. import config, crud, models, schemas
+from ..conditional import Validators, library_validators
+from ..database import get_read_db, get_write_db
+from ..fields import FieldSet
+from ..pagination import decode_cursor, set_next_cursor
+from ..responses import row_response, rows_response
 
 router = APIRouter(prefix="/music", tags=["music"])
 
+# ?fields= for the list and detail endpoints; ``card`` is what the grid view shows
+FIELDS = FieldSet(
+    models.Music, schemas.MusicResponse,
+    card=("id", "title", "artist", "cover_url", "status", "play_count", "favorite", "rating"),
+)
+
 @router.get("", response_model=List[schemas.MusicResponse])
-def get_music_list(
+async def get_music_list(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    validators: Validators = Depends(library_validators("music")),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    query = db.query(models.Music)
-    
-    if status:
-        query = query.filter(models.Music.status == status)
-    
-    music = query.order_by(models.Music.updated_at.desc()).offset(skip).limit(limit).all()
-    return music
+    """Newest first. Pass the X-Next-Cursor header back as ``cursor`` for the next page."""
+    names = FIELDS.resolve(fields)
+    music = await crud.get_all_music(db, skip=skip, limit=limit, status=status, after=decode_cursor(cursor), columns=FIELDS.columns(names))
+    response = rows_response(music, fields=names, headers=validators.headers)
+    set_next_cursor(response, music, limit)
+    return response
 
 @router.get("/{music_id}", response_model=schemas.MusicResponse)
-def get_music(music_id: int, db: Session = Depends(get_db)):
-    music = db.query(models.Music).filter(models.Music.id == music_id).first()
+async def get_music(music_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    names = FIELDS.resolve(fields)
+    music = await crud.get_music(db, music_id, columns=FIELDS.columns(names))
     if not music:
         raise HTTPException(status_code=404, detail="Music not found")
-    return music
+    return row_response(music, fields=names)
 
 @router.post("", response_model=schemas.MusicResponse)
-def create_music(music: schemas.MusicCreate, db: Session = Depends(get_db)):
-    db_music = models.Music(**music.dict())
-    db.add(db_music)
-    db.commit()
-    db.refresh(db_music)
-    return db_music
+async def create_music(music: schemas.MusicCreate, db: AsyncSession = Depends(get_write_db)):
+    return await crud.create_music(db, music)
+
+@router.post("/bulk", response_model=schemas.BulkResult, response_model_exclude_none=True)
+async def bulk_upsert_music(
+    items: List[schemas.MusicCreate] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    db: AsyncSession = Depends(get_write_db)
+):
+    """Create or update many music in one transaction, matching existing rows on spotify_id"""
+    return await crud.bulk_upsert_music(db, items)
+
+@router.patch("/batch", response_model=schemas.BatchPatchResult, response_model_exclude_none=True)
+async def batch_update_music(
+    response: Response,
+    items: List[schemas.BatchPatchItem] = Body(..., max_length=config.BULK_MAX_ITEMS),
+    atomic: bool = True,
+    db: AsyncSession = Depends(get_write_db),
+):
+    """Apply many ``{id, changes}`` partial updates in one transaction, with an outcome per item
+
+    By default nothing is written unless every item applies (409 otherwise);
+    ``atomic=false`` commits the items that do.
+    """
+    result = await crud.batch_update(db, models.Music, schemas.MusicUpdate, items, atomic)
+    if not result["committed"]:
+        response.status_code = 409
+    return result
 
 @router.put("/{music_id}", response_model=schemas.MusicResponse)
-def update_music(music_id: int, music: schemas.MusicUpdate, db: Session = Depends(get_db)):
-    db_music = db.query(models.Music).filter(models.Music.id == music_id).first()
+async def update_music(music_id: int, music: schemas.MusicUpdate, db: AsyncSession = Depends(get_write_db)):
+    db_music = await crud.update_music(db, music_id, music)
     if not db_music:
         raise HTTPException(status_code=404, detail="Music not found")
-    
-    for key, value in music.dict(exclude_unset=True).items():
-        setattr(db_music, key, value)
-    
-    db.commit()
-    db.refresh(db_music)
     return db_music
 
 @router.delete("/{music_id}")
-def delete_music(music_id: int, db: Session = Depends(get_db)):
-    db_music = db.query(models.Music).filter(models.Music.id == music_id).first()
+async def delete_music(music_id: int, db: AsyncSession = Depends(get_write_db)):
+    db_music = await crud.delete_music(db, music_id)
     if not db_music:
         raise HTTPException(status_code=404, detail="Music not found")
-    
-    db.delete(db_music)
-    db.commit()
     return {"message": "Music deleted successfully"}
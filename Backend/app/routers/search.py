@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from .. import crud
+from ..database import get_read_db
+from ..fts import FTS_TABLES
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("")
+async def search_library(
+    q: str,
+    types: Optional[str] = None,
+    limit: int = 20,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Full-text search over the local library, best matches first
+    types: comma-separated subset of anime, manga, games, music (default: all)
+    """
+    media_types = [t.strip() for t in types.split(",") if t.strip()] if types else list(FTS_TABLES)
+    unknown = [t for t in media_types if t not in FTS_TABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown media type: {', '.join(unknown)}")
+    
+    matches = await crud.search_library(db, q, media_types, limit=limit)
+    
+    return {
+        "results": [
+            {
+                "media": m["media"],
+                "id": m["id"],
+                "title": m["title"],
+                "image_url": m["image_url"],
+                "status": m["status"],
+                "score": round(-m["rank"], 6),
+                "title_highlight": m["title_highlight"],
+                "snippet": m["snippet"],
+            }
+            for m in matches
+        ]
+    }
@@ -1,11 +1,35 @@
-from fastapi import APIRouter, HTTPException, Header
-import spotipy
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from fastapi.responses import StreamingResponse
+import asyncio
+import heapq
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+from .. import config
+from ..cache import TTLCache
+from ..spotify_client import SpotifyClient, SpotifyRateLimited, get_spotify_clients
+from ..spotify_shapes import (
+    calculate_artist_rank,
+    shape_album,
+    shape_artist,
+    shape_playlist,
+    shape_playlist_item,
+    shape_track,
+)
+from ..responses import FastJSONRoute, dumps
+from ..spotify_sync import RESOURCES, SpotifyMirror, get_spotify_mirror
 
-router = APIRouter(prefix="/spotify", tags=["spotify"])
+router = APIRouter(prefix="/spotify", tags=["spotify"], route_class=FastJSONRoute)
 
-def get_spotify_client(authorization: str = None):
-    """Get Spotify client using provided Bearer token"""
+# Tracks Spotify embeds in an album object
+ALBUM_EMBEDDED_TRACKS = 50
+
+# Rows read from the mirror per query when streaming all of them
+MIRROR_STREAM_PAGE = 500
+
+def get_spotify_client(request: Request, authorization: str = None) -> SpotifyClient:
+    """Get the pooled Spotify client for the provided Bearer token"""
     if not authorization or not authorization.startswith('Bearer '):
         raise HTTPException(
             status_code=401,
@@ -13,35 +37,17 @@ def get_spotify_client(authorization: str = None):
         )
     
     token = authorization.replace('Bearer ', '')
-    return spotipy.Spotify(auth=token)
-
-def calculate_artist_rank(followers):
-    """Calculate approximate global rank based on followers"""
-    if followers >= 80000000:
-        return 1
-    elif followers >= 50000000:
-        return 5
-    elif followers >= 30000000:
-        return 10
-    elif followers >= 20000000:
-        return 20
-    elif followers >= 10000000:
-        return 50
-    elif followers >= 5000000:
-        return 100
-    elif followers >= 2000000:
-        return 500
-    elif followers >= 1000000:
-        return 1000
-    elif followers >= 500000:
-        return 5000
-    elif followers >= 100000:
-        return 10000
-    else:
-        return 50000
+    return get_spotify_clients(request).for_token(token)
+
+def rate_limited(e: SpotifyRateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Spotify is rate limiting requests, try again shortly",
+        headers={"Retry-After": str(int(e.retry_after or 1))},
+    )
 
 @router.get("/check-auth")
-def check_auth(authorization: str = Header(None)):
+async def check_auth(request: Request, authorization: str = Header(None)):
     """Check if user has valid Spotify token"""
     try:
         if not authorization:
@@ -52,8 +58,8 @@ def check_auth(authorization: str = Header(None)):
             }
         
         # Try to use the token
-        sp = get_spotify_client(authorization)
-        user = sp.current_user()
+        sp = get_spotify_client(request, authorization)
+        user = await sp.current_user()
         
         return {
             "authenticated": True,
@@ -76,88 +82,248 @@ def check_auth(authorization: str = Header(None)):
             "message": str(e)
         }
 
+def _parse_ids(ids: str) -> List[str]:
+    parsed = [i.strip() for i in ids.split(",") if i.strip()]
+    if not parsed:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(parsed) > config.SPOTIFY_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {config.SPOTIFY_BATCH_MAX_IDS} ids per request")
+    return parsed
+
+async def _batch_lookup(fetch, key: str, ids: List[str], chunk_size: int) -> list:
+    """Look ``ids`` up in concurrent chunks of ``chunk_size``; None where Spotify has nothing"""
+    unique = list(dict.fromkeys(ids))
+    chunks = [unique[i:i + chunk_size] for i in range(0, len(unique), chunk_size)]
+    semaphore = asyncio.Semaphore(config.SPOTIFY_FANOUT_CONCURRENCY)
+
+    async def fetch_chunk(chunk):
+        async with semaphore:
+            return (await fetch(chunk))[key]
+
+    found = {}
+    for chunk, items in zip(chunks, await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks))):
+        # Results come back in request order, with null for unknown ids
+        found.update(zip(chunk, items))
+    return [found.get(i) for i in ids]
+
+@router.get("/cache-stats")
+def get_cache_stats(request: Request):
+    """Hit/miss counts of the Spotify catalogue caches"""
+    return get_spotify_clients(request).cache_stats()
+
 @router.get("/artist/{artist_id}")
-def get_artist_details(artist_id: str, authorization: str = Header(None)):
+async def get_artist_details(request: Request, artist_id: str, authorization: str = Header(None)):
     """Get detailed artist information"""
     try:
-        sp = get_spotify_client(authorization)
-        artist = sp.artist(artist_id)
-        
-        rank = calculate_artist_rank(artist["followers"]["total"])
-        
-        return {
-            "id": artist["id"],
-            "name": artist["name"],
-            "image_url": artist["images"][0]["url"] if artist["images"] else None,
-            "genres": artist["genres"],
-            "followers": artist["followers"]["total"],
-            "popularity": artist["popularity"],
-            "rank": rank,
-        }
+        sp = get_spotify_client(request, authorization)
+        artist = await sp.artist(artist_id)
+        return shape_artist(artist)
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/artists")
+async def get_artists(request: Request, ids: str, authorization: str = Header(None)):
+    """Get several artists at once; ``ids`` is comma-separated, results keep its order"""
+    try:
+        sp = get_spotify_client(request, authorization)
+        artists = await _batch_lookup(sp.artists, "artists", _parse_ids(ids), 50)
+        return {"artists": [shape_artist(a) if a else None for a in artists]}
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/tracks")
+async def get_tracks(request: Request, ids: str, authorization: str = Header(None)):
+    """Get several tracks at once; ``ids`` is comma-separated, results keep its order"""
+    try:
+        sp = get_spotify_client(request, authorization)
+        tracks = await _batch_lookup(sp.tracks, "tracks", _parse_ids(ids), 50)
+        return {"tracks": [shape_track(t) if t else None for t in tracks]}
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/albums")
+async def get_albums(request: Request, ids: str, authorization: str = Header(None)):
+    """Get several albums at once; ``ids`` is comma-separated, results keep its order"""
+    try:
+        sp = get_spotify_client(request, authorization)
+        albums = await _batch_lookup(sp.albums, "albums", _parse_ids(ids), 20)
+        return {"albums": [shape_album(a) if a else None for a in albums]}
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_source(source: str):
+    if source not in ("live", "mirror"):
+        raise HTTPException(status_code=400, detail="source must be 'live' or 'mirror'")
+
+async def _mirror_state(request: Request, sp: SpotifyClient, resource: str):
+    """(mirror, user_id, sync state) for ``resource``; the state is None before the first sync
+
+    A missing or outdated mirror is refreshed in the background.
+    """
+    mirror = get_spotify_mirror(request)
+    user_id = await sp.user_id()
+    state = await mirror.state(user_id, resource)
+    if state is None or time.time() - state.synced_at > config.SPOTIFY_MIRROR_MAX_AGE:
+        mirror.sync_in_background(sp, user_id)
+    return mirror, user_id, state
+
+def _freshness(mirror: SpotifyMirror, state) -> dict:
+    age = time.time() - state.synced_at
+    return {
+        "synced_at": datetime.fromtimestamp(state.synced_at, timezone.utc).isoformat(),
+        "age_seconds": int(age),
+        "stale": age > config.SPOTIFY_MIRROR_MAX_AGE,
+        "syncing": mirror.is_syncing(state.user_id),
+    }
+
+def _stream_all(sp: SpotifyClient, first_page: dict, shape, keep=lambda item: True) -> StreamingResponse:
+    """Stream every item from ``first_page`` onwards as NDJSON, one shaped item per line
+
+    Each following page is requested as soon as the previous one arrives, so the
+    next round trip overlaps with writing the current page. An upstream failure
+    mid-stream ends it with an ``{"error": ...}`` line.
+    """
+    async def lines():
+        page, prefetch = first_page, None
+        try:
+            while page is not None:
+                prefetch = asyncio.create_task(sp.next(page)) if page.get("next") else None
+                for item in page["items"]:
+                    if keep(item):
+                        yield dumps(shape(item)) + b"\n"
+                page = await prefetch if prefetch else None
+                prefetch = None
+        except Exception as e:
+            yield dumps({"error": str(e)}) + b"\n"
+        finally:
+            if prefetch is not None:
+                prefetch.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _stream_mirrored(first: list, read, offset: int) -> StreamingResponse:
+    """Stream mirrored items as NDJSON, in the same shape and format as ``_stream_all``
+
+    ``first`` holds up to MIRROR_STREAM_PAGE items from ``offset``; ``read(limit, offset)``
+    returns the following ones.
+    """
+    async def lines():
+        items, position = first, offset
+        try:
+            while items:
+                for item in items:
+                    yield dumps(item) + b"\n"
+                if len(items) < MIRROR_STREAM_PAGE:
+                    break
+                position += len(items)
+                items = await read(MIRROR_STREAM_PAGE, position)
+        except Exception as e:
+            yield dumps({"error": str(e)}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/playlists")
-def get_playlists(
+async def get_playlists(
+    request: Request,
     authorization: str = Header(None),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    stream_all: bool = Query(False, alias="all"),
+    source: str = "live",
 ):
-    """Get user's Spotify playlists"""
+    """Get user's Spotify playlists
+
+    With ``all=true`` every playlist from ``offset`` on is streamed as NDJSON.
+    ``source=mirror`` answers from the local mirror once it has been synced.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        playlists = sp.current_user_playlists(limit=limit, offset=offset)
+        _check_source(source)
+        sp = get_spotify_client(request, authorization)
+        if source == "mirror":
+            mirror, user_id, state = await _mirror_state(request, sp, "playlists")
+            if state is not None and stream_all:
+                first = await mirror.playlists(user_id, MIRROR_STREAM_PAGE, offset)
+                return _stream_mirrored(first, lambda limit, at: mirror.playlists(user_id, limit, at), offset)
+            if state is not None:
+                return {
+                    "playlists": await mirror.playlists(user_id, limit, offset),
+                    "total": state.total,
+                    "mirror": _freshness(mirror, state),
+                }
+        if stream_all:
+            first_page = await sp.current_user_playlists(limit=50, offset=offset)
+            return _stream_all(sp, first_page, shape_playlist)
+        playlists = await sp.current_user_playlists(limit=limit, offset=offset)
         
         return {
-            "playlists": [
-                {
-                    "id": playlist["id"],
-                    "name": playlist["name"],
-                    "tracks_count": playlist["tracks"]["total"],
-                    "image_url": playlist["images"][0]["url"] if playlist["images"] else None,
-                    "owner": playlist["owner"]["display_name"],
-                    "public": playlist["public"],
-                    "description": playlist.get("description", ""),
-                    "collaborative": playlist.get("collaborative", False),
-                }
-                for playlist in playlists["items"]
-            ],
+            "playlists": [shape_playlist(playlist) for playlist in playlists["items"]],
             "total": playlists["total"]
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/playlists/{playlist_id}/tracks")
-def get_playlist_tracks(
+async def get_playlist_tracks(
+    request: Request,
     playlist_id: str,
     authorization: str = Header(None),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    stream_all: bool = Query(False, alias="all"),
+    source: str = "live",
 ):
-    """Get tracks from a specific playlist"""
+    """Get tracks from a specific playlist
+
+    With ``all=true`` every track from ``offset`` on is streamed as NDJSON.
+    ``source=mirror`` answers from the local mirror once it has been synced.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.playlist_tracks(playlist_id, limit=limit, offset=offset)
+        _check_source(source)
+        sp = get_spotify_client(request, authorization)
+        if source == "mirror":
+            mirror, user_id, state = await _mirror_state(request, sp, "playlists")
+            mirrored = state and await mirror.playlist_tracks(
+                user_id, playlist_id, MIRROR_STREAM_PAGE if stream_all else limit, offset
+            )
+            if mirrored and stream_all:
+
+                async def read(limit, at):
+                    # The snapshot may have moved on mid-stream; end there
+                    page = await mirror.playlist_tracks(user_id, playlist_id, limit, at)
+                    return page[0] if page else []
+
+                return _stream_mirrored(mirrored[0], read, offset)
+            if mirrored:
+                tracks, total = mirrored
+                return {"tracks": tracks, "total": total, "mirror": _freshness(mirror, state)}
+        if stream_all:
+            first_page = await sp.playlist_tracks(playlist_id, limit=100, offset=offset)
+            return _stream_all(sp, first_page, shape_playlist_item, keep=lambda item: item["track"] is not None)
+        results = await sp.playlist_tracks(playlist_id, limit=limit, offset=offset)
         
         return {
             "tracks": [
-                {
-                    "id": item["track"]["id"] if item["track"] else None,
-                    "name": item["track"]["name"] if item["track"] else "Unknown Track",
-                    "artists": [artist["name"] for artist in item["track"]["artists"]] if item["track"] else ["Unknown Artist"],
-                    "album": {
-                        "name": item["track"]["album"]["name"] if item["track"] and item["track"]["album"] else "Unknown Album",
-                        "id": item["track"]["album"]["id"] if item["track"] and item["track"]["album"] else None,
-                    },
-                    "duration_ms": item["track"]["duration_ms"] if item["track"] else 0,
-                    "popularity": item["track"]["popularity"] if item["track"] else 0,
-                    "track_number": item["track"]["track_number"] if item["track"] else 0,
-                    "added_at": item["added_at"],
-                }
+                shape_playlist_item(item)
                 for item in results["items"]
                 if item["track"] is not None
             ],
@@ -165,21 +331,40 @@ def get_playlist_tracks(
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/albums/{album_id}/tracks")
-def get_album_tracks(
+async def get_album_tracks(
+    request: Request,
     album_id: str,
     authorization: str = Header(None),
     limit: int = 50,
     offset: int = 0
 ):
-    """Get tracks from a specific album"""
+    """Get tracks from a specific album
+
+    The album object embeds its first page of tracks, so a window inside that
+    page costs one cached album lookup. Later windows only fetch their page,
+    taking the album details from the entity cache; the album is fetched
+    alongside just when it isn't cached yet.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.album_tracks(album_id, limit=limit, offset=offset)
-        album_info = sp.album(album_id)
+        sp = get_spotify_client(request, authorization)
+        if offset + limit <= ALBUM_EMBEDDED_TRACKS:
+            album_info = await sp.album(album_id)
+            embedded = album_info["tracks"]
+            results = {"items": embedded["items"][offset:offset + limit], "total": embedded["total"]}
+        else:
+            album_info = sp.entities.peek("album", album_id)
+            if album_info is not None:
+                results = await sp.album_tracks(album_id, limit=limit, offset=offset)
+            else:
+                album_info, results = await asyncio.gather(
+                    sp.album(album_id), sp.album_tracks(album_id, limit=limit, offset=offset)
+                )
         
         return {
             "tracks": [
@@ -212,44 +397,112 @@ def get_album_tracks(
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/liked-albums")
-def get_liked_albums(
+async def get_liked_albums(
+    request: Request,
     authorization: str = Header(None),
-    limit: int = 50
+    limit: int = 50,
+    stream_all: bool = Query(False, alias="all"),
+    source: str = "live",
 ):
-    """Get user's liked albums"""
+    """Get user's liked albums
+
+    With ``all=true`` the whole saved library is streamed as NDJSON.
+    ``source=mirror`` answers from the local mirror once it has been synced.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.current_user_saved_albums(limit=limit)
+        _check_source(source)
+        sp = get_spotify_client(request, authorization)
+        if source == "mirror":
+            mirror, user_id, state = await _mirror_state(request, sp, "saved_albums")
+            if state is not None and stream_all:
+                read = lambda limit, at: mirror.saved(user_id, "saved_albums", limit, at)
+                return _stream_mirrored(await read(MIRROR_STREAM_PAGE, 0), read, 0)
+            if state is not None:
+                return {
+                    "albums": await mirror.saved(user_id, "saved_albums", limit),
+                    "total": state.total,
+                    "mirror": _freshness(mirror, state),
+                }
+        if stream_all:
+            first_page = await sp.current_user_saved_albums(limit=50)
+            return _stream_all(sp, first_page, lambda item: shape_album(item["album"]))
+        results = await sp.current_user_saved_albums(limit=limit)
         
         return {
-            "albums": [
-                {
-                    "id": item["album"]["id"],
-                    "name": item["album"]["name"],
-                    "artist": ", ".join([artist["name"] for artist in item["album"]["artists"]]),
-                    "image_url": item["album"]["images"][0]["url"] if item["album"]["images"] else None,
-                    "total_tracks": item["album"]["total_tracks"],
-                    "release_date": item["album"]["release_date"],
+            "albums": [shape_album(item["album"]) for item in results["items"]],
+            "total": results["total"]
+        }
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/saved-tracks")
+async def get_saved_tracks(
+    request: Request,
+    authorization: str = Header(None),
+    limit: int = 50,
+    offset: int = 0,
+    stream_all: bool = Query(False, alias="all"),
+    source: str = "live",
+):
+    """Get user's saved (liked) tracks, newest first
+
+    With ``all=true`` the whole saved library is streamed as NDJSON.
+    ``source=mirror`` answers from the local mirror once it has been synced.
+    """
+    try:
+        _check_source(source)
+        sp = get_spotify_client(request, authorization)
+        if source == "mirror":
+            mirror, user_id, state = await _mirror_state(request, sp, "saved_tracks")
+            if state is not None and stream_all:
+                read = lambda limit, at: mirror.saved(user_id, "saved_tracks", limit, at)
+                return _stream_mirrored(await read(MIRROR_STREAM_PAGE, offset), read, offset)
+            if state is not None:
+                return {
+                    "tracks": await mirror.saved(user_id, "saved_tracks", limit, offset),
+                    "total": state.total,
+                    "mirror": _freshness(mirror, state),
                 }
-                for item in results["items"]
-            ],
+        if stream_all:
+            first_page = await sp.current_user_saved_tracks(limit=50, offset=offset)
+            return _stream_all(sp, first_page, lambda item: shape_track(item["track"]))
+        results = await sp.current_user_saved_tracks(limit=limit, offset=offset)
+        
+        return {
+            "tracks": [shape_track(item["track"]) for item in results["items"]],
             "total": results["total"]
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/followed-artists")
-def get_followed_artists(authorization: str = Header(None)):
-    """Get user's followed artists"""
+async def get_followed_artists(request: Request, authorization: str = Header(None), source: str = "live"):
+    """Get user's followed artists
+
+    ``source=mirror`` answers from the local mirror once it has been synced.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.current_user_followed_artists(limit=50)
+        _check_source(source)
+        sp = get_spotify_client(request, authorization)
+        if source == "mirror":
+            mirror, user_id, state = await _mirror_state(request, sp, "followed_artists")
+            if state is not None:
+                return {"artists": await mirror.followed_artists(user_id), "mirror": _freshness(mirror, state)}
+        results = await sp.current_user_followed_artists(limit=50)
         
         return {
             "artists": [
@@ -267,11 +520,14 @@ def get_followed_artists(authorization: str = Header(None)):
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/top-tracks")
-def get_top_tracks(
+async def get_top_tracks(
+    request: Request,
     authorization: str = Header(None),
     time_range: str = "medium_term",
     limit: int = 20
@@ -281,8 +537,8 @@ def get_top_tracks(
     time_range: short_term (4 weeks), medium_term (6 months), long_term (all time)
     """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.current_user_top_tracks(limit=limit, time_range=time_range)
+        sp = get_spotify_client(request, authorization)
+        results = await sp.current_user_top_tracks(limit=limit, time_range=time_range)
         
         return {
             "tracks": [
@@ -299,11 +555,14 @@ def get_top_tracks(
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/top-artists")
-def get_top_artists(
+async def get_top_artists(
+    request: Request,
     authorization: str = Header(None),
     time_range: str = "medium_term",
     limit: int = 20
@@ -313,8 +572,8 @@ def get_top_artists(
     time_range: short_term (4 weeks), medium_term (6 months), long_term (all time)
     """
     try:
-        sp = get_spotify_client(authorization)
-        results = sp.current_user_top_artists(limit=limit, time_range=time_range)
+        sp = get_spotify_client(request, authorization)
+        results = await sp.current_user_top_artists(limit=limit, time_range=time_range)
         
         return {
             "artists": [
@@ -332,115 +591,207 @@ def get_top_artists(
         }
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _compute_user_stats(sp: SpotifyClient):
+    (
+        top_tracks_short,
+        top_tracks_long,
+        top_artists_short,
+        top_artists_medium,
+        top_artists_long,
+        saved_tracks,
+        playlists,
+        followed,
+    ) = await asyncio.gather(
+        sp.current_user_top_tracks(limit=10, time_range="short_term"),
+        sp.current_user_top_tracks(limit=10, time_range="long_term"),
+        sp.current_user_top_artists(limit=50, time_range="short_term"),
+        sp.current_user_top_artists(limit=50, time_range="medium_term"),
+        sp.current_user_top_artists(limit=50, time_range="long_term"),
+        sp.current_user_saved_tracks(limit=1),
+        sp.current_user_playlists(limit=1),
+        sp.current_user_followed_artists(limit=1),
+    )
+    
+    # Genres across every top artist in all three ranges, each artist counted once
+    top_artists = {}
+    for results in (top_artists_short, top_artists_medium, top_artists_long):
+        for artist in results["items"]:
+            top_artists.setdefault(artist["id"], artist)
+    
+    genre_counts = Counter(genre for artist in top_artists.values() for genre in artist["genres"])
+    top_genres = genre_counts.most_common(5)
+    
+    return {
+        "total_saved_tracks": saved_tracks["total"],
+        "total_playlists": playlists["total"],
+        "total_followed_artists": followed["artists"]["total"],
+        "top_tracks_month": [
+            {
+                "name": t["name"],
+                "artist": ", ".join([a["name"] for a in t["artists"]]),
+                "image_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
+            }
+            for t in top_tracks_short["items"]
+        ],
+        "top_tracks_all_time": [
+            {
+                "name": t["name"],
+                "artist": ", ".join([a["name"] for a in t["artists"]]),
+                "image_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
+            }
+            for t in top_tracks_long["items"]
+        ],
+        "top_artists_month": [
+            {
+                "name": a["name"],
+                "image_url": a["images"][0]["url"] if a["images"] else None,
+            }
+            for a in top_artists_short["items"][:10]
+        ],
+        "top_artists_all_time": [
+            {
+                "name": a["name"],
+                "image_url": a["images"][0]["url"] if a["images"] else None,
+            }
+            for a in top_artists_long["items"][:10]
+        ],
+        "top_genres": [{"genre": g, "count": c} for g, c in top_genres],
+    }
+
 @router.get("/user-stats")
-def get_user_stats(authorization: str = Header(None)):
-    """Get Wrapped-like stats"""
+async def get_user_stats(request: Request, authorization: str = Header(None), refresh: bool = False):
+    """Get Wrapped-like stats
+
+    Cached per Spotify user for SPOTIFY_USER_STATS_TTL; pass ``refresh=true``
+    to recompute.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        
-        top_tracks_short = sp.current_user_top_tracks(limit=10, time_range="short_term")
-        top_tracks_long = sp.current_user_top_tracks(limit=10, time_range="long_term")
-        top_artists_short = sp.current_user_top_artists(limit=10, time_range="short_term")
-        top_artists_long = sp.current_user_top_artists(limit=10, time_range="long_term")
-        saved_tracks = sp.current_user_saved_tracks(limit=1)
-        playlists = sp.current_user_playlists(limit=1)
-        followed = sp.current_user_followed_artists(limit=1)
-        
-        all_genres = []
-        for artist in top_artists_long["items"]:
-            all_genres.extend(artist["genres"])
-        
-        genre_counts = {}
-        for genre in all_genres:
-            genre_counts[genre] = genre_counts.get(genre, 0) + 1
+        sp = get_spotify_client(request, authorization)
+        cache = get_spotify_clients(request).user_stats
+        user_id = await sp.user_id()
         
-        top_genres = sorted(genre_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-        
-        return {
-            "total_saved_tracks": saved_tracks["total"],
-            "total_playlists": playlists["total"],
-            "total_followed_artists": followed["artists"]["total"],
-            "top_tracks_month": [
-                {
-                    "name": t["name"],
-                    "artist": ", ".join([a["name"] for a in t["artists"]]),
-                    "image_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
-                }
-                for t in top_tracks_short["items"]
-            ],
-            "top_tracks_all_time": [
-                {
-                    "name": t["name"],
-                    "artist": ", ".join([a["name"] for a in t["artists"]]),
-                    "image_url": t["album"]["images"][0]["url"] if t["album"]["images"] else None,
-                }
-                for t in top_tracks_long["items"]
-            ],
-            "top_artists_month": [
-                {
-                    "name": a["name"],
-                    "image_url": a["images"][0]["url"] if a["images"] else None,
-                }
-                for a in top_artists_short["items"]
-            ],
-            "top_artists_all_time": [
-                {
-                    "name": a["name"],
-                    "image_url": a["images"][0]["url"] if a["images"] else None,
-                }
-                for a in top_artists_long["items"]
-            ],
-            "top_genres": [{"genre": g, "count": c} for g, c in top_genres],
-        }
+        stats = None if refresh else cache.get(user_id)
+        if stats is None:
+            stats = await _compute_user_stats(sp)
+            cache.set(user_id, stats)
+        return stats
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def _followed_artist_ids(sp: SpotifyClient) -> List[str]:
+    """Every followed artist, paging with the ``after`` cursor"""
+    artist_ids, after = [], None
+    while True:
+        page = (await sp.current_user_followed_artists(limit=50, after=after))["artists"]
+        artist_ids.extend(artist["id"] for artist in page["items"])
+        after = (page.get("cursors") or {}).get("after")
+        if not page.get("next") or not after:
+            return artist_ids
+
+async def _artist_releases(sp: SpotifyClient, cache: TTLCache, artist_id: str, semaphore: asyncio.Semaphore):
+    releases = cache.get(artist_id)
+    if releases is not None:
+        return releases
+    async with semaphore:
+        albums = await sp.artist_albums(artist_id, include_groups='album,single', limit=3)
+    releases = [
+        {
+            "id": album["id"],
+            "name": album["name"],
+            "artist": ", ".join([a["name"] for a in album["artists"]]),
+            "artist_id": artist_id,
+            "image_url": album["images"][0]["url"] if album["images"] else None,
+            "release_date": album["release_date"],
+            "total_tracks": album["total_tracks"],
+            "album_type": album["album_type"],
+        }
+        for album in albums["items"]
+    ]
+    cache.set(artist_id, releases)
+    return releases
+
 @router.get("/new-releases")
-def get_new_releases(authorization: str = Header(None)):
-    """Get new releases from followed artists"""
+async def get_new_releases(request: Request, authorization: str = Header(None), limit: int = 20):
+    """Get new releases from followed artists
+
+    Artists are fetched concurrently and their releases cached for
+    SPOTIFY_ARTIST_ALBUMS_TTL, so a refresh only refetches stale artists.
+    """
     try:
-        sp = get_spotify_client(authorization)
-        
-        followed = sp.current_user_followed_artists(limit=50)
-        artist_ids = [artist["id"] for artist in followed["artists"]["items"]]
+        sp = get_spotify_client(request, authorization)
+        artist_ids = await _followed_artist_ids(sp)
         
         if not artist_ids:
             return {"albums": []}
         
-        all_albums = []
+        cache = get_spotify_clients(request).artist_albums
+        semaphore = asyncio.Semaphore(config.SPOTIFY_FANOUT_CONCURRENCY)
+        results = await asyncio.gather(
+            *(_artist_releases(sp, cache, artist_id, semaphore) for artist_id in artist_ids),
+            return_exceptions=True,
+        )
         
-        for artist_id in artist_ids[:20]:
-            try:
-                albums = sp.artist_albums(
-                    artist_id,
-                    album_type='album,single',
-                    limit=3
-                )
-                
-                for album in albums["items"]:
-                    all_albums.append({
-                        "id": album["id"],
-                        "name": album["name"],
-                        "artist": ", ".join([a["name"] for a in album["artists"]]),
-                        "artist_id": artist_id,
-                        "image_url": album["images"][0]["url"] if album["images"] else None,
-                        "release_date": album["release_date"],
-                        "total_tracks": album["total_tracks"],
-                        "album_type": album["album_type"],
-                    })
-            except:
+        # Artists that failed are skipped; a collaboration is listed once
+        unique = {}
+        for result in results:
+            if isinstance(result, Exception):
                 continue
+            for album in result:
+                unique.setdefault(album["id"], album)
         
-        all_albums.sort(key=lambda x: x["release_date"], reverse=True)
-        
-        return {"albums": all_albums[:20]}
+        return {"albums": heapq.nlargest(limit, unique.values(), key=lambda x: x["release_date"])}
         
     except HTTPException:
         raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/sync", status_code=202)
+async def start_sync(request: Request, authorization: str = Header(None)):
+    """Sync the user's library into the local mirror in the background"""
+    try:
+        sp = get_spotify_client(request, authorization)
+        user_id = await sp.user_id()
+        get_spotify_mirror(request).sync_in_background(sp, user_id)
+        return await _sync_status(request, user_id)
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/sync")
+async def get_sync_status(request: Request, authorization: str = Header(None)):
+    """Freshness of each mirrored part of the user's library"""
+    try:
+        sp = get_spotify_client(request, authorization)
+        return await _sync_status(request, await sp.user_id())
+    except HTTPException:
+        raise
+    except SpotifyRateLimited as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _sync_status(request: Request, user_id: str):
+    mirror = get_spotify_mirror(request)
+    states = await mirror.states(user_id)
+    return {
+        "syncing": mirror.is_syncing(user_id),
+        "resources": {
+            resource: {**_freshness(mirror, states[resource]), "total": states[resource].total} if resource in states else None
+            for resource in RESOURCES
+        },
+    }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 # Anime Schemas
@@ -13,6 +13,7 @@ class AnimeBase(BaseModel):
     status: str = "plan_to_watch"
     user_score: Optional[float] = None
     notes: Optional[str] = None
+    mal_id: Optional[int] = None
 
 class AnimeCreate(AnimeBase):
     pass
@@ -39,6 +40,7 @@ class MangaBase(BaseModel):
     rating: float = 0.0
     notes: Optional[str] = None
     image_url: Optional[str] = None
+    mal_id: Optional[int] = None
 
 class MangaCreate(MangaBase):
     pass
@@ -48,7 +50,6 @@ class MangaUpdate(MangaBase):
 
 class MangaResponse(MangaBase):
     id: int
-    mal_id: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -89,6 +90,7 @@ class MusicBase(BaseModel):
     play_count: int = 0
     favorite: bool = False
     notes: Optional[str] = None
+    spotify_id: Optional[str] = None
 
 class MusicCreate(MusicBase):
     pass
@@ -104,6 +106,59 @@ class MusicResponse(MusicBase):
     class Config:
         from_attributes = True
 
+# Bulk import Schemas
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    action: str  # created | updated | skipped
+    detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    results: List[BulkItemResult]
+
+# Batch update Schemas
+class BatchPatchItem(BaseModel):
+    id: int
+    changes: Dict[str, Any]
+
+class BatchPatchItemResult(BaseModel):
+    index: int
+    id: int
+    status: str  # updated | not_found | invalid | failed | rolled_back
+    detail: Optional[str] = None
+
+class BatchPatchResult(BaseModel):
+    committed: bool
+    updated: int
+    failed: int
+    results: List[BatchPatchItemResult]
+
+# MyAnimeList import Schemas
+class ImportJobCreate(BaseModel):
+    username: str
+    media: str = "anime"  # anime | manga
+
+class ImportJobResponse(BaseModel):
+    id: int
+    username: str
+    media: str
+    status: str  # running | completed | failed | interrupted
+    next_offset: int
+    pages: int
+    imported: int
+    created: int
+    updated: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Stats Schema
 class StatsResponse(BaseModel):
     total_anime: int
@@ -0,0 +1,242 @@
+"""Async client for the Spotify Web API.
+
+Every user token shares one pooled httpx client, so requests reuse warm
+connections to api.spotify.com instead of opening a session per request.
+``SpotifyClients`` hands out a lightweight ``SpotifyClient`` per token, and a
+429 pauses that token's calls for Retry-After before the request is retried.
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import Request
+
+from . import config
+from .cache import TTLCache
+from .jikan import retry_after_seconds
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class SpotifyError(Exception):
+    """Spotify answered with an error status"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"http status: {status}, {message}")
+        self.status = status
+        self.message = message
+
+class SpotifyRateLimited(SpotifyError):
+    """Spotify kept answering 429, or asked for a longer wait than we allow"""
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__(429, "Spotify rate limit exceeded")
+        self.retry_after = retry_after
+
+def _error_message(response: httpx.Response) -> str:
+    try:
+        error = response.json().get("error")
+    except ValueError:
+        return response.text or response.reason_phrase
+    if isinstance(error, dict):
+        return error.get("message") or response.reason_phrase
+    return str(error or response.reason_phrase)
+
+class EntityCache:
+    """Catalogue objects (albums, tracks, artists) by Spotify ID, shared by every token
+
+    Albums and tracks never change once released, so they live for days; artists
+    carry follower counts and popularity, so they expire sooner.
+    """
+
+    def __init__(self, maxsize: int = config.SPOTIFY_ENTITY_CACHE_SIZE):
+        self.ttls = {
+            "album": config.SPOTIFY_ALBUM_TTL,
+            "track": config.SPOTIFY_TRACK_TTL,
+            "artist": config.SPOTIFY_ARTIST_TTL,
+        }
+        self._cache = TTLCache(maxsize)
+        self.hits = {kind: 0 for kind in self.ttls}
+        self.misses = {kind: 0 for kind in self.ttls}
+
+    def get(self, kind: str, entity_id: str):
+        entity = self._cache.get((kind, entity_id))
+        if entity is None:
+            self.misses[kind] += 1
+        else:
+            self.hits[kind] += 1
+        return entity
+
+    def peek(self, kind: str, entity_id: str):
+        """The cached entity or None, without counting a hit or miss"""
+        return self._cache.get((kind, entity_id))
+
+    def set(self, kind: str, entity: Optional[dict]):
+        if entity:
+            self._cache.set((kind, entity["id"]), entity, self.ttls[kind])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._cache),
+            **{kind: {"hits": self.hits[kind], "misses": self.misses[kind]} for kind in self.ttls},
+        }
+
+class SpotifyClient:
+    """Spotify Web API calls made with one user's access token
+
+    Method names follow spotipy so the router reads the same as before.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        token: str,
+        max_retries: int = config.SPOTIFY_MAX_RETRIES,
+        max_retry_wait: float = config.SPOTIFY_MAX_RETRY_WAIT,
+        entities: Optional[EntityCache] = None,
+    ):
+        self.http = http
+        self.entities = entities or EntityCache()
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self._resume_at = 0.0
+        self._user_id: Optional[str] = None
+
+    async def get(self, path: str, **params) -> Dict[str, Any]:
+        params = {k: v for k, v in params.items() if v is not None}
+        for attempt in range(self.max_retries + 1):
+            wait = self._resume_at - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            # An empty params dict would strip the query from a ``next`` link
+            response = await self.http.get(path, params=params or None, headers=self.headers)
+            if response.status_code < 400:
+                return response.json() if response.content else {}
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = 0.5 * 2 ** attempt
+            if delay > self.max_retry_wait:
+                break
+            if response.status_code == 429:
+                # Hold back every call on this token, not just this one
+                self._resume_at = max(self._resume_at, time.monotonic() + delay)
+            else:
+                await asyncio.sleep(delay)
+
+        if response.status_code == 429:
+            raise SpotifyRateLimited(retry_after_seconds(response))
+        raise SpotifyError(response.status_code, _error_message(response))
+
+    async def next(self, page: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The page after ``page``, following Spotify's ``next`` link"""
+        return await self.get(page["next"]) if page.get("next") else None
+
+    async def current_user(self):
+        user = await self.get("/me")
+        self._user_id = user.get("id")
+        return user
+
+    async def user_id(self) -> str:
+        """Spotify user ID behind this token, looked up once"""
+        if self._user_id is None:
+            await self.current_user()
+        return self._user_id
+
+    async def _entity(self, kind: str, path: str, entity_id: str):
+        entity = self.entities.get(kind, entity_id)
+        if entity is None:
+            entity = await self.get(f"{path}/{entity_id}")
+            self.entities.set(kind, entity)
+        return entity
+
+    async def _entities(self, kind: str, path: str, ids: List[str]) -> List[Optional[dict]]:
+        """Several entities in ``ids`` order, with one upstream call for the uncached ones"""
+        found = {entity_id: self.entities.get(kind, entity_id) for entity_id in ids}
+        missing = [entity_id for entity_id, entity in found.items() if entity is None]
+        if missing:
+            fetched = (await self.get(path, ids=",".join(missing)))[f"{kind}s"]
+            for entity_id, entity in zip(missing, fetched):
+                self.entities.set(kind, entity)
+                found[entity_id] = entity
+        return [found[entity_id] for entity_id in ids]
+
+    async def artist(self, artist_id: str):
+        return await self._entity("artist", "/artists", artist_id)
+
+    async def artists(self, artist_ids: List[str]):
+        return {"artists": await self._entities("artist", "/artists", artist_ids)}
+
+    async def artist_albums(self, artist_id: str, include_groups: str = None, limit: int = 20, offset: int = 0):
+        return await self.get(f"/artists/{artist_id}/albums", include_groups=include_groups, limit=limit, offset=offset)
+
+    async def album(self, album_id: str):
+        return await self._entity("album", "/albums", album_id)
+
+    async def albums(self, album_ids: List[str]):
+        return {"albums": await self._entities("album", "/albums", album_ids)}
+
+    async def album_tracks(self, album_id: str, limit: int = 50, offset: int = 0):
+        return await self.get(f"/albums/{album_id}/tracks", limit=limit, offset=offset)
+
+    async def track(self, track_id: str):
+        return await self._entity("track", "/tracks", track_id)
+
+    async def tracks(self, track_ids: List[str]):
+        return {"tracks": await self._entities("track", "/tracks", track_ids)}
+
+    async def playlist_tracks(self, playlist_id: str, limit: int = 100, offset: int = 0):
+        return await self.get(f"/playlists/{playlist_id}/tracks", limit=limit, offset=offset)
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0):
+        return await self.get("/me/playlists", limit=limit, offset=offset)
+
+    async def current_user_saved_albums(self, limit: int = 20, offset: int = 0):
+        return await self.get("/me/albums", limit=limit, offset=offset)
+
+    async def current_user_saved_tracks(self, limit: int = 20, offset: int = 0):
+        return await self.get("/me/tracks", limit=limit, offset=offset)
+
+    async def current_user_followed_artists(self, limit: int = 20, after: str = None):
+        return await self.get("/me/following", type="artist", limit=limit, after=after)
+
+    async def current_user_top_tracks(self, limit: int = 20, offset: int = 0, time_range: str = "medium_term"):
+        return await self.get("/me/top/tracks", limit=limit, offset=offset, time_range=time_range)
+
+    async def current_user_top_artists(self, limit: int = 20, offset: int = 0, time_range: str = "medium_term"):
+        return await self.get("/me/top/artists", limit=limit, offset=offset, time_range=time_range)
+
+class SpotifyClients:
+    """Per-token clients sharing a single connection pool
+
+    Also holds caches of public catalogue data that any token may reuse.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, maxsize: int = config.SPOTIFY_CLIENT_CACHE_SIZE):
+        self.http = http
+        self._clients = TTLCache(maxsize)
+        self.entities = EntityCache()
+        # Latest releases per artist id, for /spotify/new-releases
+        self.artist_albums = TTLCache(config.SPOTIFY_ARTIST_ALBUMS_CACHE_SIZE, config.SPOTIFY_ARTIST_ALBUMS_TTL)
+        # Assembled /spotify/user-stats payloads per Spotify user id
+        self.user_stats = TTLCache(config.SPOTIFY_CLIENT_CACHE_SIZE, config.SPOTIFY_USER_STATS_TTL)
+
+    def for_token(self, token: str) -> SpotifyClient:
+        client = self._clients.get(token)
+        if client is None:
+            client = SpotifyClient(self.http, token, entities=self.entities)
+            self._clients.set(token, client)
+        return client
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "entities": self.entities.stats(),
+            "artist_albums": {"size": len(self.artist_albums), "hits": self.artist_albums.hits, "misses": self.artist_albums.misses},
+            "user_stats": {"size": len(self.user_stats), "hits": self.user_stats.hits, "misses": self.user_stats.misses},
+        }
+
+def get_spotify_clients(request: Request) -> SpotifyClients:
+    """The per-token client registry created in the app lifespan"""
+    return request.app.state.spotify
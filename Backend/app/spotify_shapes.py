@@ -0,0 +1,84 @@
+"""Shapes the Spotify routes return, shared with the local library mirror."""
+
+def calculate_artist_rank(followers):
+    """Calculate approximate global rank based on followers"""
+    if followers >= 80000000:
+        return 1
+    elif followers >= 50000000:
+        return 5
+    elif followers >= 30000000:
+        return 10
+    elif followers >= 20000000:
+        return 20
+    elif followers >= 10000000:
+        return 50
+    elif followers >= 5000000:
+        return 100
+    elif followers >= 2000000:
+        return 500
+    elif followers >= 1000000:
+        return 1000
+    elif followers >= 500000:
+        return 5000
+    elif followers >= 100000:
+        return 10000
+    else:
+        return 50000
+
+def shape_artist(artist):
+    return {
+        "id": artist["id"],
+        "name": artist["name"],
+        "image_url": artist["images"][0]["url"] if artist["images"] else None,
+        "genres": artist["genres"],
+        "followers": artist["followers"]["total"],
+        "popularity": artist["popularity"],
+        "rank": calculate_artist_rank(artist["followers"]["total"]),
+    }
+
+def shape_track(track):
+    return {
+        "id": track["id"],
+        "name": track["name"],
+        "artist": ", ".join([artist["name"] for artist in track["artists"]]),
+        "album": track["album"]["name"],
+        "image_url": track["album"]["images"][0]["url"] if track["album"]["images"] else None,
+        "popularity": track["popularity"],
+    }
+
+def shape_album(album):
+    return {
+        "id": album["id"],
+        "name": album["name"],
+        "artist": ", ".join([artist["name"] for artist in album["artists"]]),
+        "image_url": album["images"][0]["url"] if album["images"] else None,
+        "total_tracks": album["total_tracks"],
+        "release_date": album["release_date"],
+    }
+
+def shape_playlist(playlist):
+    return {
+        "id": playlist["id"],
+        "name": playlist["name"],
+        "tracks_count": playlist["tracks"]["total"],
+        "image_url": playlist["images"][0]["url"] if playlist["images"] else None,
+        "owner": playlist["owner"]["display_name"],
+        "public": playlist["public"],
+        "description": playlist.get("description", ""),
+        "collaborative": playlist.get("collaborative", False),
+    }
+
+def shape_playlist_item(item):
+    return {
+        "id": item["track"]["id"] if item["track"] else None,
+        "name": item["track"]["name"] if item["track"] else "Unknown Track",
+        "artists": [artist["name"] for artist in item["track"]["artists"]] if item["track"] else ["Unknown Artist"],
+        "album": {
+            "name": item["track"]["album"]["name"] if item["track"] and item["track"]["album"] else "Unknown Album",
+            "id": item["track"]["album"]["id"] if item["track"] and item["track"]["album"] else None,
+        },
+        "duration_ms": item["track"]["duration_ms"] if item["track"] else 0,
+        "popularity": item["track"]["popularity"] if item["track"] else 0,
+        "track_number": item["track"]["track_number"] if item["track"] else 0,
+        "added_at": item["added_at"],
+    }
@@ -0,0 +1,270 @@
+"""Local SQLite mirror of each user's Spotify library.
+
+``SpotifyMirror`` copies playlists (with their tracks), saved albums, saved
+tracks and followed artists into local tables, incrementally:
+
+* a playlist's tracks are refetched only when its ``snapshot_id`` changed
+* saved albums and tracks are read newest first, stopping at the newest
+  ``added_at`` already mirrored; a full pass runs only when the mirrored count
+  disagrees with Spotify's total afterwards, i.e. something was removed
+* followed artists have no change marker and are refetched whole
+
+The /spotify routes serve from the mirror with ``source=mirror``.
+"""
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from . import config, models
+from .database import AsyncReadSessionLocal, AsyncSessionLocal
+from .spotify_client import SpotifyClient
+from .spotify_shapes import shape_album, shape_artist, shape_playlist, shape_playlist_item, shape_track
+
+RESOURCES = ("playlists", "saved_albums", "saved_tracks", "followed_artists")
+
+# kind stored in spotify_saved_items, client method and shape per saved resource
+SAVED = {
+    "saved_albums": ("album", "current_user_saved_albums", shape_album),
+    "saved_tracks": ("track", "current_user_saved_tracks", shape_track),
+}
+
+async def _all_items(sp: SpotifyClient, page: dict) -> list:
+    items = []
+    while page is not None:
+        items.extend(page["items"])
+        page = await sp.next(page)
+    return items
+
+class SpotifyMirror:
+    def __init__(self, session_factory=AsyncSessionLocal, read_session_factory=AsyncReadSessionLocal):
+        self._session_factory = session_factory
+        self._read_session_factory = read_session_factory
+        self._syncing: Dict[str, asyncio.Task] = {}
+
+    def is_syncing(self, user_id: str) -> bool:
+        return user_id in self._syncing
+
+    def sync_in_background(self, sp: SpotifyClient, user_id: str) -> asyncio.Task:
+        """Start syncing ``user_id``'s library, or return the sync already running"""
+        task = self._syncing.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._sync(sp, user_id))
+            self._syncing[user_id] = task
+            task.add_done_callback(lambda _: self._syncing.pop(user_id, None))
+        return task
+
+    async def _sync(self, sp: SpotifyClient, user_id: str) -> Dict[str, str]:
+        jobs = [self._sync_playlists(sp, user_id), self._sync_followed_artists(sp, user_id)]
+        jobs += [self._sync_saved(sp, user_id, resource) for resource in SAVED]
+        names = ["playlists", "followed_artists", *SAVED]
+        outcome = {}
+        for name, result in zip(names, await asyncio.gather(*jobs, return_exceptions=True)):
+            if isinstance(result, Exception):
+                print(f"[SPOTIFY SYNC] {name} failed for {user_id}: {result}")
+                outcome[name] = f"failed: {result}"
+            else:
+                outcome[name] = "ok"
+        return outcome
+
+    async def _mark_synced(self, db, user_id: str, resource: str, total: int):
+        stmt = insert(models.SpotifySyncState).values(
+            user_id=user_id, resource=resource, synced_at=time.time(), total=total,
+        )
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["user_id", "resource"],
+            set_={"synced_at": stmt.excluded.synced_at, "total": stmt.excluded.total},
+        ))
+
+    async def _sync_playlists(self, sp: SpotifyClient, user_id: str):
+        playlists = await _all_items(sp, await sp.current_user_playlists(limit=50))
+        ids = [p["id"] for p in playlists]
+        async with self._read_session_factory() as db:
+            # Tracks are mirrored per playlist, so another user's sync may already have them
+            mirrored = dict((await db.execute(
+                select(models.SpotifyPlaylist.playlist_id, models.SpotifyPlaylist.tracks_snapshot_id)
+                .where(models.SpotifyPlaylist.playlist_id.in_(ids), models.SpotifyPlaylist.tracks_snapshot_id.is_not(None))
+            )).all()) if ids else {}
+
+        async with self._session_factory() as db:
+            await db.execute(delete(models.SpotifyPlaylist).where(models.SpotifyPlaylist.user_id == user_id))
+            if playlists:
+                await db.execute(insert(models.SpotifyPlaylist), [
+                    {
+                        "user_id": user_id,
+                        "playlist_id": p["id"],
+                        "position": position,
+                        "snapshot_id": p["snapshot_id"],
+                        "tracks_snapshot_id": mirrored.get(p["id"]),
+                        "data": json.dumps(shape_playlist(p)),
+                    }
+                    for position, p in enumerate(playlists)
+                ])
+            await self._mark_synced(db, user_id, "playlists", len(playlists))
+            await db.commit()
+
+        stale = [p for p in playlists if mirrored.get(p["id"]) != p["snapshot_id"]]
+        semaphore = asyncio.Semaphore(config.SPOTIFY_FANOUT_CONCURRENCY)
+
+        async def refresh(playlist):
+            async with semaphore:
+                items = await _all_items(sp, await sp.playlist_tracks(playlist["id"], limit=100))
+            await self._write_playlist_tracks(playlist["id"], playlist["snapshot_id"], items)
+
+        await asyncio.gather(*(refresh(p) for p in stale))
+
+        async with self._session_factory() as db:
+            await db.execute(delete(models.SpotifyPlaylistTrack).where(
+                models.SpotifyPlaylistTrack.playlist_id.not_in(select(models.SpotifyPlaylist.playlist_id))
+            ))
+            await db.commit()
+
+    async def _write_playlist_tracks(self, playlist_id: str, snapshot_id: str, items: list):
+        rows = [
+            {"playlist_id": playlist_id, "position": position, "data": json.dumps(shape_playlist_item(item))}
+            for position, item in enumerate(item for item in items if item["track"] is not None)
+        ]
+        async with self._session_factory() as db:
+            await db.execute(delete(models.SpotifyPlaylistTrack).where(models.SpotifyPlaylistTrack.playlist_id == playlist_id))
+            if rows:
+                await db.execute(insert(models.SpotifyPlaylistTrack), rows)
+            await db.execute(
+                update(models.SpotifyPlaylist)
+                .where(models.SpotifyPlaylist.playlist_id == playlist_id)
+                .values(tracks_snapshot_id=snapshot_id)
+            )
+            await db.commit()
+
+    async def _sync_saved(self, sp: SpotifyClient, user_id: str, resource: str):
+        kind, method, shape = SAVED[resource]
+        fetch = getattr(sp, method)
+        saved = models.SpotifySavedItem
+        async with self._read_session_factory() as db:
+            watermark = await db.scalar(
+                select(func.max(saved.added_at)).where(saved.user_id == user_id, saved.kind == kind)
+            )
+
+        # Newest first; stop at the first item older than what is already mirrored
+        page = await fetch(limit=50)
+        total, items = page["total"], []
+        while page is not None:
+            fresh = [item for item in page["items"] if watermark is None or item["added_at"] >= watermark]
+            items.extend(fresh)
+            if len(fresh) < len(page["items"]):
+                break
+            page = await sp.next(page)
+
+        async with self._session_factory() as db:
+            await self._upsert_saved(db, user_id, kind, shape, items)
+            count = await db.scalar(select(func.count()).where(saved.user_id == user_id, saved.kind == kind))
+            if count != total:
+                # Something was unsaved; only a full pass can tell what
+                await db.rollback()
+                items = await _all_items(sp, await fetch(limit=50))
+                await db.execute(delete(saved).where(saved.user_id == user_id, saved.kind == kind))
+                await self._upsert_saved(db, user_id, kind, shape, items)
+                total = len(items)
+            await self._mark_synced(db, user_id, resource, total)
+            await db.commit()
+
+    async def _upsert_saved(self, db, user_id: str, kind: str, shape, items: list):
+        if not items:
+            return
+        stmt = insert(models.SpotifySavedItem)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "kind", "item_id"],
+            set_={"added_at": stmt.excluded.added_at, "data": stmt.excluded.data},
+        )
+        await db.execute(stmt, [
+            {
+                "user_id": user_id,
+                "kind": kind,
+                "item_id": item[kind]["id"],
+                "added_at": item["added_at"],
+                "data": json.dumps(shape(item[kind])),
+            }
+            for item in items
+        ])
+
+    async def _sync_followed_artists(self, sp: SpotifyClient, user_id: str):
+        artists, after = [], None
+        while True:
+            page = (await sp.current_user_followed_artists(limit=50, after=after))["artists"]
+            artists.extend(page["items"])
+            after = (page.get("cursors") or {}).get("after")
+            if not page.get("next") or not after:
+                break
+
+        async with self._session_factory() as db:
+            await db.execute(delete(models.SpotifyFollowedArtist).where(models.SpotifyFollowedArtist.user_id == user_id))
+            if artists:
+                await db.execute(insert(models.SpotifyFollowedArtist), [
+                    {"user_id": user_id, "artist_id": a["id"], "position": position, "data": json.dumps(shape_artist(a))}
+                    for position, a in enumerate(artists)
+                ])
+            await self._mark_synced(db, user_id, "followed_artists", len(artists))
+            await db.commit()
+
+    async def states(self, user_id: str) -> Dict[str, models.SpotifySyncState]:
+        async with self._read_session_factory() as db:
+            rows = (await db.execute(
+                select(models.SpotifySyncState).where(models.SpotifySyncState.user_id == user_id)
+            )).scalars()
+            return {row.resource: row for row in rows}
+
+    async def state(self, user_id: str, resource: str) -> Optional[models.SpotifySyncState]:
+        async with self._read_session_factory() as db:
+            return await db.get(models.SpotifySyncState, (user_id, resource))
+
+    async def playlists(self, user_id: str, limit: int, offset: int = 0) -> List[dict]:
+        table = models.SpotifyPlaylist
+        async with self._read_session_factory() as db:
+            rows = await db.execute(
+                select(table.data).where(table.user_id == user_id)
+                .order_by(table.position).limit(limit).offset(offset)
+            )
+            return [json.loads(data) for data in rows.scalars()]
+
+    async def playlist_tracks(self, user_id: str, playlist_id: str, limit: int, offset: int = 0) -> Optional[Tuple[List[dict], int]]:
+        """Mirrored tracks and their count, or None unless they match the user's latest snapshot"""
+        table = models.SpotifyPlaylistTrack
+        async with self._read_session_factory() as db:
+            playlist = await db.get(models.SpotifyPlaylist, (user_id, playlist_id))
+            if playlist is None or playlist.tracks_snapshot_id != playlist.snapshot_id:
+                return None
+            total = await db.scalar(select(func.count()).where(table.playlist_id == playlist_id))
+            rows = await db.execute(
+                select(table.data).where(table.playlist_id == playlist_id)
+                .order_by(table.position).limit(limit).offset(offset)
+            )
+            return [json.loads(data) for data in rows.scalars()], total
+
+    async def saved(self, user_id: str, resource: str, limit: int, offset: int = 0) -> List[dict]:
+        kind = SAVED[resource][0]
+        table = models.SpotifySavedItem
+        async with self._read_session_factory() as db:
+            rows = await db.execute(
+                select(table.data).where(table.user_id == user_id, table.kind == kind)
+                .order_by(table.added_at.desc(), table.item_id).limit(limit).offset(offset)
+            )
+            return [json.loads(data) for data in rows.scalars()]
+
+    async def followed_artists(self, user_id: str) -> List[dict]:
+        table = models.SpotifyFollowedArtist
+        async with self._read_session_factory() as db:
+            rows = await db.execute(select(table.data).where(table.user_id == user_id).order_by(table.position))
+            return [json.loads(data) for data in rows.scalars()]
+
+    async def aclose(self):
+        tasks = list(self._syncing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def get_spotify_mirror(request: Request) -> SpotifyMirror:
+    """Dependency returning the mirror created in the app lifespan"""
+    return request.app.state.spotify_mirror
@@ -0,0 +1,103 @@
+"""Concurrent throughput of the library endpoints: sync sessions vs async.
+
+Seeds a throwaway database, then drives the same mix of list, detail and
+update requests through the old sync handlers (run on Starlette's threadpool)
+and through the async routers, printing requests per second for each.
+
+    python benchmark_db.py --rows 5000 --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+workdir = tempfile.mkdtemp()
+os.environ["DATABASE_PATH"] = os.path.join(workdir, "benchmark.db")
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(workdir, "image_cache")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import engine, get_db
+from app.main import app as async_app
+
+def legacy_app() -> FastAPI:
+    """The anime handlers as they were before the async switch"""
+    app = FastAPI()
+
+    @app.get("/anime")
+    def get_anime_list(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+        return [
+            schemas.AnimeResponse.model_validate(a)
+            for a in db.query(models.Anime).order_by(models.Anime.updated_at.desc()).offset(skip).limit(limit).all()
+        ]
+
+    @app.get("/anime/{anime_id}")
+    def get_anime(anime_id: int, db: Session = Depends(get_db)):
+        anime = db.query(models.Anime).filter(models.Anime.id == anime_id).first()
+        if not anime:
+            raise HTTPException(status_code=404, detail="Anime not found")
+        return schemas.AnimeResponse.model_validate(anime)
+
+    @app.put("/anime/{anime_id}")
+    def update_anime(anime_id: int, anime: schemas.AnimeUpdate, db: Session = Depends(get_db)):
+        db_anime = db.query(models.Anime).filter(models.Anime.id == anime_id).first()
+        for key, value in anime.model_dump(exclude_unset=True).items():
+            setattr(db_anime, key, value)
+        db.commit()
+        db.refresh(db_anime)
+        return schemas.AnimeResponse.model_validate(db_anime)
+
+    return app
+
+def seed(rows: int):
+    statuses = ["watching", "completed", "plan_to_watch", "dropped"]
+    with engine.begin() as conn:
+        conn.execute(models.Anime.__table__.insert(), [
+            {"title": f"Anime {i}", "status": random.choice(statuses), "current_episode": i % 24, "episodes": 24}
+            for i in range(rows)
+        ])
+
+async def run(app: FastAPI, rows: int, requests: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(client: httpx.AsyncClient, i: int):
+        async with semaphore:
+            kind = i % 10
+            if kind < 4:
+                response = await client.get("/anime", params={"limit": 50, "skip": random.randrange(rows - 50)})
+            elif kind < 9:
+                response = await client.get(f"/anime/{random.randint(1, rows)}")
+            else:
+                response = await client.put(f"/anime/{random.randint(1, rows)}", json={"title": "Edited", "current_episode": i % 24})
+            response.raise_for_status()
+
+    # ASGITransport doesn't run the lifespan, which starts the services handlers depend on
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(one(client, i) for i in range(requests)))
+            return requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    seed(args.rows)
+    print(f"Seeded {args.rows} anime into {os.environ['DATABASE_PATH']}")
+
+    for name, app in (("sync sessions (before)", legacy_app()), ("async sessions (after)", async_app)):
+        rate = asyncio.run(run(app, args.rows, args.requests, args.concurrency))
+        print(f"{name:<24} {rate:8.0f} req/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Serialization throughput of large library pages: validated ORM path vs row fast path.
+
+Seeds a throwaway database, then requests big /anime pages from a copy of the
+handler that loads ORM objects and validates them through response_model, and
+from the current router that streams plain rows through orjson. Prints rows
+per second for each page size.
+
+    python benchmark_serialization.py --rows 10000 --limits 1000 10000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, models, schemas
+from app.database import engine, get_read_db
+from app.main import app as fast_app
+
+def legacy_app() -> FastAPI:
+    """The anime list handler as it was before the fast path"""
+    app = FastAPI()
+
+    @app.get("/anime", response_model=List[schemas.AnimeResponse])
+    async def get_anime_list(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
+        return await crud.get_all_anime(db, skip=skip, limit=limit)
+
+    return app
+
+def seed(rows: int):
+    statuses = ["watching", "completed", "plan_to_watch", "dropped"]
+    with engine.begin() as conn:
+        conn.execute(models.Anime.__table__.insert(), [
+            {
+                "title": f"Anime {i}",
+                "title_english": f"English title {i}",
+                "synopsis": "A reasonably long synopsis. " * 8,
+                "image_url": f"https://cdn.myanimelist.net/images/anime/{i}.jpg",
+                "status": random.choice(statuses),
+                "current_episode": i % 24,
+                "episodes": 24,
+                "user_score": i % 10,
+                "mal_id": i + 1,
+            }
+            for i in range(rows)
+        ])
+
+async def run(app: FastAPI, limit: int, repeat: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        (await client.get("/anime", params={"limit": limit})).raise_for_status()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            response = await client.get("/anime", params={"limit": limit})
+            response.raise_for_status()
+        return limit * repeat / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    seed(args.rows)
+    print(f"Seeded {args.rows} anime into {os.environ['DATABASE_PATH']}")
+
+    for limit in args.limits:
+        for name, app in (("validated ORM (before)", legacy_app()), ("row fast path (after)", fast_app)):
+            rate = asyncio.run(run(app, limit, args.repeat))
+            print(f"limit={limit:<6} {name:<24} {rate:10.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
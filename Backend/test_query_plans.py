@@ -0,0 +1,114 @@
+"""EXPLAIN QUERY PLAN checks for the hot library queries.
+
+Runs the real crud list/lookup queries against a scratch database, captures
+the SQL they send, and fails if SQLite plans any of them as a full table
+scan or with a temporary B-tree sort.
+
+    python test_query_plans.py      (or: python -m pytest test_query_plans.py)
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(), "query_plans.db")
+
+from sqlalchemy import event, select
+
+from app import crud, models
+from app.database import AsyncReadSessionLocal, async_read_engine, engine
+from app.migrations import run_migrations
+
+models.Base.metadata.create_all(bind=engine)
+run_migrations(engine)
+
+def capture(run):
+    """Run ``run(db)`` and return every (sql, params) it sent to SQLite"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    async def main():
+        event.listen(async_read_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            async with AsyncReadSessionLocal() as db:
+                await run(db)
+        finally:
+            event.remove(async_read_engine.sync_engine, "before_cursor_execute", record)
+
+    asyncio.run(main())
+    return statements
+
+def query_plan(statement, parameters):
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+    return [row[-1] for row in rows]
+
+def assert_indexed(run, search=False):
+    """No full scans or temp sorts; with ``search`` the filter must seek an index"""
+    statements = capture(run)
+    assert statements, "query did not reach the database"
+    for statement, parameters in statements:
+        plan = query_plan(statement, parameters)
+        if search:
+            assert any(step.startswith("SEARCH ") for step in plan), f"no index seek in {plan} for {statement}"
+        for step in plan:
+            assert "TEMP B-TREE" not in step, f"temp sort in {plan} for {statement}"
+            assert not (step.startswith("SCAN ") and "USING" not in step), f"full scan in {plan} for {statement}"
+
+def test_anime_list():
+    assert_indexed(lambda db: crud.get_all_anime(db))
+
+def test_anime_list_by_status():
+    assert_indexed(lambda db: crud.get_all_anime(db, status="watching"), search=True)
+
+def test_manga_list():
+    assert_indexed(lambda db: crud.get_all_manga(db))
+
+def test_manga_list_by_status():
+    assert_indexed(lambda db: crud.get_all_manga(db, status="reading"), search=True)
+
+def test_music_list():
+    assert_indexed(lambda db: crud.get_all_music(db))
+
+def test_music_list_by_status():
+    assert_indexed(lambda db: crud.get_all_music(db, status="listening"), search=True)
+
+def test_games_list():
+    assert_indexed(lambda db: crud.get_all_games(db))
+
+def test_games_list_by_status():
+    assert_indexed(lambda db: crud.get_all_games(db, status="playing"), search=True)
+
+def test_anime_keyset_page():
+    after = (datetime(2024, 1, 1), 1000)
+    assert_indexed(lambda db: crud.get_all_anime(db, after=after), search=True)
+
+def test_anime_keyset_page_by_status():
+    after = (datetime(2024, 1, 1), 1000)
+    assert_indexed(lambda db: crud.get_all_anime(db, status="watching", after=after), search=True)
+
+def test_anime_by_id():
+    assert_indexed(lambda db: crud.get_anime(db, 1), search=True)
+
+def test_anime_by_mal_id():
+    assert_indexed(lambda db: db.execute(select(models.Anime).where(models.Anime.mal_id == 1)), search=True)
+
+def test_manga_by_mal_id():
+    assert_indexed(lambda db: db.execute(select(models.Manga).where(models.Manga.mal_id == 1)), search=True)
+
+def test_music_by_spotify_id():
+    assert_indexed(lambda db: db.execute(select(models.Music).where(models.Music.spotify_id == "x")), search=True)
+
+if __name__ == "__main__":
+    failed = 0
+    for name, check in list(globals().items()):
+        if name.startswith("test_") and callable(check):
+            try:
+                check()
+                print(f"✅ {name}")
+            except AssertionError as e:
+                failed += 1
+                print(f"❌ {name}: {e}")
+    raise SystemExit(1 if failed else 0)